@@ -1,20 +1,31 @@
 import streamlit as st
 import pandas as pd
+import os
 import plotly.express as px
+import surge
 from modeling import AadhaarBrain
 
 # Page Config
 st.set_page_config(page_title="Aadhaar Drishti", page_icon="🇮🇳", layout="wide")
 
-# Initialize Brain
+# Initialize Brain (lazily: each page loads only the datasets it reads, the rest
+# are warmed up in the background once the page has rendered).
+# With DRISHTI_PLANE_DIR set, every server process attaches to one shared,
+# memory-mapped copy of the data instead; the first one to start builds it.
 @st.cache_resource
 def load_brain():
     brain = AadhaarBrain()
-    brain.load_data()
+    plane_dir = os.environ.get("DRISHTI_PLANE_DIR")
+    if plane_dir:
+        brain.load_shared(plane_dir)
+    else:
+        brain.load_data(lazy=True)
     return brain
 
 try:
     brain = load_brain()
+    # Another process may have published newer data (e.g. after "Check for New Data")
+    brain.refresh()
 except Exception as e:
     st.error(f"Failed to load data: {e}")
     st.stop()
@@ -22,7 +33,46 @@ except Exception as e:
 # Sidebar
 st.sidebar.title("Aadhaar Drishti 👁️")
 st.sidebar.markdown("AI-Driven Resource Optimization")
-page = st.sidebar.radio("Navigate", ["Pulse Monitor", "Anomaly Hunter", "Infrastructure Allocator"])
+pages = ["Pulse Monitor", "Anomaly Hunter", "Infrastructure Allocator"]
+# Hidden page for operators: open with ?diagnostics=1 or run with DRISHTI_DIAGNOSTICS=1
+if st.query_params.get("diagnostics") == "1" or os.environ.get("DRISHTI_DIAGNOSTICS") == "1":
+    pages.append("Diagnostics")
+page = st.sidebar.radio("Navigate", pages)
+
+# Model fits run as background jobs on the brain's shared pool (see jobs.py), so
+# they don't freeze the session that started them. While one runs, the page polls
+# it once a second and reruns when it finishes; in between it shows the last
+# completed result.
+def job_running(job, label):
+    # Shows progress and returns True while `job` is unfinished; shows its error if it failed
+    if job is None:
+        return False
+    if job.status == "failed":
+        st.error(f"{label} failed: {job.error}")
+    if job.done():
+        return False
+    
+    @st.fragment(run_every=1.0)
+    def poll():
+        if job.done():
+            st.rerun()
+        st.progress(job.progress, text=f"{label}: {job.message}")
+    poll()
+    return True
+
+# New API dumps are folded into the shared brain without a restart. Ingesting
+# (cleaning the new shards, refitting what was fitted) runs as a background job too.
+if st.sidebar.button("Check for New Data"):
+    brain.ingest_new_shards_async()
+ingest = brain.jobs.latest("ingest")
+with st.sidebar:
+    if not job_running(ingest, "Ingesting new shards") and ingest is not None and ingest.status == "done":
+        checked = f"Checked {ingest.finished_at:%H:%M:%S}: "
+        if ingest.result:
+            st.success(checked + "added " + ", ".join(f"{len(files)} {name}" for name, files in ingest.result.items())
+                       + " shard(s).")
+        else:
+            st.info(checked + "no new shards found.")
 
 # --- Module 1: Pulse Monitor ---
 if page == "Pulse Monitor":
@@ -33,40 +83,28 @@ if page == "Pulse Monitor":
     
     with tab1:
         st.subheader("Enrolment Trends (Annual)")
-        if brain.enrol_df is not None and not brain.enrol_df.empty:
-            # Aggregate by Year
-            enrol_copy = brain.enrol_df.copy()
-            enrol_copy['year'] = enrol_copy['date'].dt.year
-            daily_enrol = enrol_copy.groupby('year')['total'].sum().reset_index()
-            
-            if not daily_enrol.empty:
-                fig = px.bar(daily_enrol, x='year', y='total', title="Yearly Enrolments (0-5 vs Adult)", 
-                             text_auto='.2s', color_discrete_sequence=['#636EFA'])
-                st.plotly_chart(fig, use_container_width=True)
-                st.info("95% of new enrolments are in the 0-5 age bracket, indicating saturation in the adult population.")
-            else:
-                st.warning("No enrolment data available for the selected period.")
+        # Yearly totals from the brain's query API (cached across sessions)
+        daily_enrol = brain.yearly_enrolment()
+        
+        if not daily_enrol.empty:
+            fig = px.bar(daily_enrol, x='year', y='total', title="Yearly Enrolments (0-5 vs Adult)", 
+                         text_auto='.2s', color_discrete_sequence=['#636EFA'])
+            st.plotly_chart(fig, use_container_width=True)
+            st.info("95% of new enrolments are in the 0-5 age bracket, indicating saturation in the adult population.")
         else:
             st.warning("Enrolment data not found or empty.")
         
     with tab2:
         st.subheader("Demographic vs Biometric Update Volume")
-        if not brain.demo_df.empty and not brain.bio_df.empty:
-            # Combine demo and bio monthly (Using 'MS' for Month Start as it's very robust)
-            demo_m = brain.demo_df.groupby(pd.Grouper(key='date', freq='M'))['total'].sum().reset_index()
-            demo_m['Type'] = 'Demographic'
-            bio_m = brain.bio_df.groupby(pd.Grouper(key='date', freq='M'))['total'].sum().reset_index()
-            bio_m['Type'] = 'Biometric'
-            
-            combined = pd.concat([demo_m, bio_m])
-            
-            if not combined.empty:
-                fig2 = px.line(combined, x='date', y='total', color='Type', markers=True, 
-                               title="Monthly Update Volume (Seasonality Check)")
-                st.plotly_chart(fig2, use_container_width=True)
-                st.warning("Note the mid-year spikes (July) correlating with school admission cycles.")
-            else:
-                st.warning("No update volume data available to display.")
+        # Combine demo and bio monthly totals
+        combined = pd.concat([brain.monthly_totals('demographic').assign(Type='Demographic'),
+                              brain.monthly_totals('biometric').assign(Type='Biometric')])
+        
+        if not combined.empty:
+            fig2 = px.line(combined, x='date', y='total', color='Type', markers=True, 
+                           title="Monthly Update Volume (Seasonality Check)")
+            st.plotly_chart(fig2, use_container_width=True)
+            st.warning("Note the mid-year spikes (July) correlating with school admission cycles.")
         else:
             st.warning("Update data (Demographic/Biometric) not found or empty.")
 
@@ -75,9 +113,28 @@ elif page == "Anomaly Hunter":
     st.title("🕵️ Anomaly Hunter: AI Diagnostics")
     st.markdown("Unsupervised Machine Learning (`IsolationForest`) to detect operational anomalies.")
     
-    if st.button("Run Anomaly Detection Model"):
-        with st.spinner("Analyzing District Patterns..."):
-            anomalies = brain.train_anomaly_model()
+    district_tab, pincode_tab, surge_tab = st.tabs(["District Hotspots", "Pincode Hotspots", "Surge Onsets"])
+    
+    with district_tab:
+        # National: one model for the country. Per-State: each district is compared with
+        # its own state's districts. Ensemble: average of both scores.
+        mode_labels = {"National": "national", "Per-State": "state", "Ensemble": "ensemble"}
+        mode = mode_labels[st.radio("Detection Mode", list(mode_labels), horizontal=True)]
+    
+        # The saved model is reused while the data is unchanged; retraining is opt-in
+        force_retrain = st.checkbox("Retrain model from scratch", value=False)
+    
+        if st.button("Run Anomaly Detection Model"):
+            brain.train_anomaly_model_async(force=force_retrain, mode=mode)
+        
+        job_running(brain.restore_model_async(), "Loading the saved model")
+        job_running(brain.jobs.latest("anomaly_model"), "Analyzing District Patterns")
+        # Last completed run (of any session), also while a newer one is in progress
+        if brain.district_stats is not None and brain.anomaly_model is not None:
+            anomalies = brain.top_anomalies(k=None)
+            timings = brain.anomaly_model.get('timings', {})
+            st.caption(f"{brain.anomaly_model['mode'].title()} model trained {brain.anomaly_model['trained_at']} on {brain.anomaly_model['n_districts']} districts "
+                       f"(fit {timings.get('total_fit', 0):.2f}s, score {brain.model_timings.get('score', 0):.2f}s).")
             
             col1, col2, col3 = st.columns(3)
             col1.metric("Total Districts Scanned", f"{len(brain.district_stats)}")
@@ -85,7 +142,8 @@ elif page == "Anomaly Hunter":
             col3.metric("Max Risk Score", f"{anomalies['risk_score'].max():.2f}")
             
             st.subheader("⚠️ High-Risk Districts")
-            st.dataframe(anomalies[['state', 'district', 'total_load', 'risk_score']].head(10).style.background_gradient(cmap='Reds'))
+            st.dataframe(brain.top_anomalies(10)[['state', 'district', 'total_load', 'risk_score']]
+                         .style.background_gradient(cmap='Reds'))
             
             # Scatter Plot
             st.subheader("Cluster View")
@@ -94,46 +152,198 @@ elif page == "Anomaly Hunter":
                              color_continuous_scale=px.colors.sequential.Viridis,
                              title="Volume vs Volatility (Anomalies in Yellow/Purple)")
             st.plotly_chart(fig, use_container_width=True)
+    
+    with pincode_tab:
+        # Hotspots inside a district only show up at pincode granularity
+        st.markdown("Scores every pincode with an `IsolationForest` sized to fit the time budget.")
+        budget = st.slider("Time Budget (seconds)", 1, 60, 10)
+        
+        if st.button("Run Pincode Scan"):
+            brain.detect_pincode_anomalies_async(time_budget=budget)
+        
+        job_running(brain.jobs.latest("pincode_scan"), "Scanning Pincodes")
+        last = brain.jobs.latest("pincode_scan", status="done")
+        if last is not None and brain.pincode_report:
+            pin_anomalies = last.result
+            report = brain.pincode_report
+            
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Pincodes Scanned", f"{report['n_pincodes']:,}")
+            col2.metric("Hotspots Detected", f"{len(pin_anomalies):,}")
+            col3.metric("Scan Time", f"{report['seconds']:.1f}s")
+            
+            st.subheader("📍 High-Risk Pincodes")
+            st.dataframe(pin_anomalies[['state', 'district', 'pincode', 'total_load', 'risk_score']].head(20)
+                         .style.background_gradient(cmap='Reds'))
+            
+            st.subheader("Budget vs Accuracy")
+            st.caption("Agreement of each smaller forest with the one used above "
+                       "(flag_jaccard: overlap of flagged pincodes, rank_corr: score rank correlation).")
+            st.dataframe(report['runs'])
+
+    with surge_tab:
+        # When a district started surging, from CUSUM/EWMA control charts on its daily
+        # update load; new shards only step the detector forward by their new days
+        st.markdown("Online change-point detection on every district's daily update load (CUSUM over an EWMA baseline).")
+        
+        if brain.surge_model is None:
+            last_job = brain.jobs.latest("surges")
+            if last_job is None or last_job.status != "failed" or st.button("Retry", key="surge_retry"):
+                brain.detect_surges_async()
+        if not job_running(brain.jobs.latest("surges"), "Building Surge Detector") and brain.surge_model is not None:
+            last_day = pd.Timestamp(brain.surge_model["last_day"])
+            window = st.slider("Onsets detected in the last (days)", 1, 90, 30)
+            recent = brain.surge_events(since=last_day - pd.Timedelta(days=window - 1))
+            active = brain.active_surges()
+            
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Districts Monitored", f"{len(brain.surge_model['keys']):,}")
+            col2.metric("Surging Now", f"{len(active)}")
+            col3.metric(f"Onsets (last {window} days)", f"{len(recent)}")
+            st.caption(f"Data up to {last_day:%d %b %Y}. New onsets are also appended to `{brain.surge_log}`.")
+            
+            st.subheader("🚨 Surge Onsets")
+            st.dataframe(recent.style.background_gradient(subset=['ratio'], cmap='Reds'), use_container_width=True)
+            
+            if not recent.empty:
+                picked = st.selectbox("Inspect District", recent.index,
+                                      format_func=lambda i: f"{recent.at[i, 'district']} ({recent.at[i, 'state']}), "
+                                                            f"onset {recent.at[i, 'onset']:%d %b}")
+                event = recent.loc[picked]
+                daily = brain.cube_query(list(surge.SURGE_DATASETS), freq='D', state=event['state'],
+                                         district=event['district'])
+                fig = px.line(daily, x='date', y='total', markers=True,
+                              title=f"Daily Update Load: {event['district']} ({event['state']})")
+                fig.add_vline(x=event['onset'], line_dash='dash', line_color='red')
+                fig.add_vline(x=event['detected'], line_dash='dot', line_color='orange')
+                st.plotly_chart(fig, use_container_width=True)
+                st.caption("Red: estimated onset. Orange: day the surge was detected.")
 
 # --- Module 3: Infrastructure Allocator ---
 elif page == "Infrastructure Allocator":
     st.title("🏗️ Infrastructure Allocator")
     st.markdown("Predictive Resource Planning for District Managers.")
     
+    # District scores and the resource plan are built in the background the first time
+    if brain.district_stats is None or brain.forecast_model is None:
+        job = brain.jobs.latest("allocator")
+        # A failed build is only retried on request, not on every rerun
+        if job is None or job.status != "failed" or st.button("Retry"):
+            job = brain.prepare_allocator_async()
+        if job_running(job, "Initializing Neural Network & Stats") or job.status == "failed":
+            st.stop()
+    
     # Select District
-    if brain.district_stats is None:
-        with st.spinner("Initializing Neural Network & Stats..."):
-            brain.train_anomaly_model()
-            
-    # Get unique, sorted states
-    states = sorted(list(set(brain.demo_df['state'].dropna().unique())))
+    # States and districts come from the brain's prebuilt index, no scan of the rows
+    states = brain.states()
     selected_state = st.selectbox("Select State", states)
     
-    # Get unique, sorted districts for selected state
-    districts_in_state = brain.demo_df[brain.demo_df['state'] == selected_state]['district'].dropna().unique()
-    districts = sorted(list(set(districts_in_state)))
+    districts = brain.districts_for(selected_state)
     selected_district = st.selectbox("Select District", districts)
     
-    # Get Stats
-    stats = brain.district_stats[brain.district_stats['district'] == selected_district]
+    # Get Stats (matched on state and district, so same-named districts don't collide)
+    stats = brain.district_row(selected_state, selected_district)
+    
+    # Monthly demand forecast + resources (seasonal model fitted for every district at once)
+    row = brain.district_plan(selected_state, selected_district)
     
-    if not stats.empty:
-        current_load = stats['total_load'].values[0]
-        st.metric("Current Annual Load (Updates)", f"{int(current_load):,}")
+    if stats is None or row is None:
+        st.info("No update activity recorded for this district.")
+    else:
+        st.metric("Total Load in Loaded Period (Updates)", f"{int(stats['total_load']):,}")
         
         st.divider()
-        st.subheader("🔮 Scenario Planning")
-        
-        growth = st.slider("Predicted Growth (Next 6 Months)", -20, 100, 20) / 100.0
+        st.subheader("🔮 Demand Forecast (Next 6 Months)")
         
-        recommendation = brain.recommend_resources(selected_district, current_load, growth)
+        history = brain.monthly_totals(['demographic', 'biometric'], state=selected_state, district=selected_district)
+        future = brain.forecast_demand(state=selected_state, district=selected_district)
+        future = future.rename(columns={'forecast': 'total'})
+        fig = px.line(pd.concat([history.assign(Series='Actual'), future.assign(Series='Forecast')]), x='date', y='total', color='Series', markers=True,
+                      title="Monthly Update Load (Demographic + Biometric)")
+        fig.add_scatter(x=future['date'], y=future['upper'], mode='lines', line=dict(dash='dot'), name='Upper (90%)')
+        st.plotly_chart(fig, use_container_width=True)
         
+        # Resources are sized for the busiest forecast month, not the average one
+        growth = row['peak_load'] / row['last_monthly_load'] - 1 if row['last_monthly_load'] else 0.0
         c1, c2, c3 = st.columns(3)
-        c1.metric("Projected Monthly Load", f"{recommendation['projected_monthly_load']:,}", delta=f"{int(growth*100)}%")
-        c2.metric("Biometric Kits Needed", f"{recommendation['kits_required']}")
-        c3.metric("Staff Required", f"{recommendation['staff_required']}")
+        c1.metric(f"Peak Monthly Load ({row['peak_month']:%b %Y})", f"{int(row['peak_load']):,}",
+                  delta=f"{growth:+.0%} vs last month")
+        c2.metric("Biometric Kits Needed", f"{row['kits_required']}")
+        c3.metric("Staff Required", f"{row['staff_required']}")
         
-        if recommendation['kits_required'] > 100:
+        if row['kits_required'] > 100:
             st.error("High Resource Demand! Consider deploying Mobile Vans.")
-        elif recommendation['kits_required'] < 5:
+        elif row['kits_required'] < 5:
             st.success("Current infrastructure is sufficient.")
+    
+    # Every district under several scenarios at once (one vectorized pass, cheap to redo per slider move)
+    st.divider()
+    st.subheader("🗺️ Nationwide What-If")
+    scenarios = st.multiselect("Headroom over Forecast Peak (%)", [-20, 0, 10, 20, 50, 100], default=[0, 20, 50])
+    r1, r2 = st.columns(2)
+    kit_rate = r1.number_input("Updates per Kit per Day", min_value=1, max_value=500, value=50)
+    staff_rate = r2.number_input("Updates per Staff per Day", min_value=1, max_value=500, value=40)
+    
+    if scenarios:
+        plan = brain.plan_resources(brain.resource_plan(), growth_rates=[g / 100 for g in sorted(scenarios)],
+                                    kit_rate=kit_rate, staff_rate=staff_rate, load_col='peak_load')
+        plan.columns = [f"{metric} ({growth:+.0%})" for metric, growth in plan.columns]
+        st.dataframe(plan)
+        st.download_button("Download Plan (CSV)", plan.to_csv().encode("utf-8"),
+                           file_name="resource_plan.csv", mime="text/csv")
+
+# --- Diagnostics (hidden) ---
+elif page == "Diagnostics":
+    st.title("🩺 Diagnostics")
+    st.markdown("Where the time and memory go: per-stage timings, row counts and optional cProfile captures.")
+    
+    metrics = brain.metrics
+    c1, c2, c3 = st.columns(3)
+    metrics.enabled = c1.checkbox("Record stage metrics", value=metrics.enabled)
+    metrics.memory = c2.checkbox("Track memory deltas (slower)", value=metrics.memory)
+    metrics.profile = c3.checkbox("Capture cProfile", value=metrics.profile)
+    
+    b1, b2 = st.columns(2)
+    if b1.button("Reload Data Now"):
+        with st.spinner("Reloading with instrumentation..."):
+            brain.load_data()
+    if b2.button("Reset Metrics"):
+        metrics.reset()
+    
+    st.subheader("Stages")
+    if metrics.stages:
+        st.dataframe(metrics.report(), use_container_width=True)
+    else:
+        st.info("No stages recorded yet. Enable metrics, then reload data or use the other pages.")
+    
+    st.subheader("Shard Loads")
+    shards = [dict(r, dataset=name) for name, rows in brain.load_report.items() for r in rows]
+    st.dataframe(pd.DataFrame(shards), use_container_width=True)
+    
+    st.subheader("Rejected Rows")
+    st.caption(f"Rows dropped while cleaning, per rule. Row numbers of each dropped row are in `{brain.quarantine_dir}`.")
+    st.dataframe(brain.rejection_report(), use_container_width=True)
+    
+    st.subheader("Memory Footprint")
+    st.dataframe(pd.DataFrame([{"frame": name, "rows": info["rows"], "MB": round(info["bytes"] / 2**20, 2)}
+                               for name, info in brain.memory_report().items()]))
+    
+    if brain.plane_dir:
+        st.subheader("Shared Data Plane")
+        st.json({"plane_dir": brain.plane_dir, "generation": brain.plane_generation})
+    
+    st.subheader("Background Jobs")
+    st.dataframe(brain.jobs.report(), use_container_width=True)
+    
+    st.subheader("Query Cache")
+    st.json(brain.query_cache.stats())
+    
+    st.subheader("Model Timings")
+    st.json(brain.model_timings)
+    
+    for name, text in list(metrics.profiles.items()):
+        with st.expander(f"cProfile: {name}"):
+            st.code(text)
+
+# Page is on screen: load whatever it didn't need in the background
+brain.warm_up()
@@ -0,0 +1,162 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+import glob
+import json
+import time
+import modeling
+from district_aliases import _squash
+
+
+# Data-quality audit: duplicate district variants, special-character districts,
+# per-variant record counts and invalid-state drops, as one JSON report.
+# Only the state/district columns of each shard are read and counted per distinct
+# (state, district) pair; the cleaning rules then run on those few thousand pairs
+# with the same functions _preprocess uses, so the audit sees exactly what the
+# app sees without loading (or looping over) the rows.
+#
+#   python audit.py ["/path/to/uidai data "] [--output audit_report.json] [--strict]
+
+DATA_DIR = modeling.DATA_DIR
+REPORT_FORMAT = 1
+
+# Characters that should never survive cleaning
+SPECIAL_CHARS = r'[*()/\\#@]'
+
+
+def _raw_pairs(data_dir, datasets):
+    # One row per (dataset, raw state, raw district) with its record count
+    counts = []
+    files = {}
+    for dataset in datasets:
+        paths = sorted(glob.glob(os.path.join(data_dir, modeling.DATASETS[dataset], "*.csv")))
+        files[dataset] = {"files": len(paths), "unreadable": []}
+        for path in paths:
+            try:
+                df = pd.read_csv(path, usecols=['state', 'district'], dtype='category')
+            except Exception as e:
+                files[dataset]["unreadable"].append({"file": os.path.basename(path), "error": f"{type(e).__name__}: {e}"})
+                continue
+            size = df.groupby(['state', 'district'], observed=True, dropna=False).size()
+            counts.append(size[size > 0].rename('records').reset_index().assign(dataset=dataset))
+    if not counts:
+        return pd.DataFrame(columns=['dataset', 'state', 'district', 'records']), files
+    pairs = pd.concat([c.astype({'state': object, 'district': object}) for c in counts], ignore_index=True)
+    pairs = pairs.groupby(['dataset', 'state', 'district'], dropna=False)['records'].sum().reset_index()
+    return pairs, files
+
+
+def audit(data_dir=DATA_DIR, datasets=None):
+    start = time.perf_counter()
+    datasets = list(datasets or modeling.DATASETS)
+    raw, files = _raw_pairs(data_dir, datasets)
+
+    # States: cleaned once per distinct raw value; NaN means _preprocess drops the row
+    raw_states = pd.Series(raw['state'].dropna().unique(), dtype=object)
+    cleaned_states = dict(zip(raw_states, modeling._canonical_states(raw_states)))
+    raw['clean_state'] = raw['state'].map(cleaned_states)
+    dropped = raw[raw['clean_state'].isna()]
+    invalid = (dropped.assign(value=dropped['state'].fillna('<missing>').astype(str).str.strip())
+               .groupby('value')['records'].sum().sort_values(ascending=False))
+
+    # Districts: the exact state-scoped cleaning of _preprocess, run on the pairs
+    kept = raw[raw['clean_state'].notna()].drop(columns='state').rename(columns={'clean_state': 'state'})
+    kept['state'] = kept['state'].astype('category')
+    kept = modeling._apply_districts(kept.reset_index(drop=True))
+    clean = (kept.groupby(['state', 'district', 'dataset'], observed=True)['records'].sum()
+             .unstack('dataset', fill_value=0).reindex(columns=datasets, fill_value=0))
+    clean['records'] = clean.sum(axis=1)
+    clean = clean.reset_index().astype({'state': str, 'district': str})
+
+    # Names that only differ in case, spacing or punctuation within one state
+    clean['key'] = clean['district'].map(_squash)
+    n_variants = clean.groupby(['state', 'key'])['district'].transform('size')
+    dupes = clean[n_variants > 1].sort_values(['state', 'key', 'records'], ascending=[True, True, False])
+    duplicate_groups = [{"state": state, "key": key,
+                         "variants": group[['district', 'records']].to_dict('records')}
+                        for (state, key), group in dupes.groupby(['state', 'key'], sort=True)]
+
+    special = clean[clean['district'].str.contains(SPECIAL_CHARS, regex=True)]
+    states = sorted(clean['state'].unique())
+    lowered = pd.Series(states, dtype=object).str.lower()
+    by_state = clean.groupby('state')['district'].agg(lambda d: sorted(d))
+
+    rows = raw.groupby('dataset')['records'].sum()
+    dropped_rows = dropped.groupby('dataset')['records'].sum()
+    for dataset in datasets:
+        files[dataset]["rows"] = int(rows.get(dataset, 0))
+        files[dataset]["dropped_rows"] = int(dropped_rows.get(dataset, 0))
+
+    report = {
+        "format": REPORT_FORMAT,
+        "generated_at": pd.Timestamp.now().isoformat(timespec='seconds'),
+        "data_dir": data_dir,
+        "rules_version": modeling._rules_version(),
+        "alias_table_version": modeling.DISTRICT_ALIASES["version"],
+        "datasets": files,
+        "states": states,
+        "state_case_duplicates": sorted(lowered[lowered.duplicated(keep=False)].map(
+            dict(zip(lowered, states))).unique().tolist()),
+        "invalid_states": [{"state": s, "records": int(n)} for s, n in invalid.items()],
+        "districts": {s: list(d) for s, d in by_state.items()},
+        "duplicate_groups": duplicate_groups,
+        "special_char_districts": special[['state', 'district', 'records']].to_dict('records'),
+        "district_records": clean.drop(columns='key').to_dict('records'),
+    }
+    report["summary"] = {
+        "rows": int(raw['records'].sum()),
+        "dropped_rows": int(dropped['records'].sum()),
+        "states": len(states),
+        "districts": len(clean),
+        "duplicate_groups": len(duplicate_groups),
+        "special_char_districts": len(special),
+        "invalid_states": len(invalid),
+        "unreadable_files": sum(len(f["unreadable"]) for f in files.values()),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    return _plain(report)
+
+
+def _plain(value):
+    # numpy scalars -> Python, so the report is json.dump-able as is
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def issues(report):
+    # Number of findings that mean the cleaning rules need attention
+    summary = report["summary"]
+    return summary["duplicate_groups"] + summary["special_char_districts"] + len(report["state_case_duplicates"])
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Audit district/state data quality")
+    parser.add_argument("data_dir", nargs="?", default=DATA_DIR)
+    parser.add_argument("--output", default="audit_report.json")
+    parser.add_argument("--dataset", action="append", choices=list(modeling.DATASETS),
+                        help="audit only this dataset (repeatable)")
+    parser.add_argument("--strict", action="store_true",
+                        help="exit with status 1 when duplicates or special characters are found")
+    args = parser.parse_args()
+
+    report = audit(args.data_dir, args.dataset)
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=1, ensure_ascii=False)
+    summary = report["summary"]
+    print(f"Audited {summary['rows']:,} rows in {summary['seconds']:.2f}s: {summary['states']} states, "
+          f"{summary['districts']} districts, {summary['duplicate_groups']} duplicate groups, "
+          f"{summary['special_char_districts']} special-character districts, "
+          f"{summary['dropped_rows']:,} rows dropped for invalid states. Report: {args.output}")
+    if args.strict and issues(report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import pandas as pd
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modeling import AadhaarBrain, DATASETS, HAS_DUCKDB, _read_shard
+import synthetic
+
+# Times each AadhaarBrain stage (and the work each app page does) on synthetic
+# shards at several scales, records peak Python memory and compares with a stored
+# baseline. Each stage is timed --repeats times and the best run is kept, so one
+# slow run (page cache, a busy neighbour) doesn't move the baseline or trip the
+# gate. Memory comes from a separate, traced run of each stage (tracemalloc slows
+# code down, so it never overlaps the timed runs); pool workers in other processes
+# are not counted, hence --workers 1 by default.
+#
+#   python benchmarks/run_benchmarks.py                   # 1x 10x 100x vs baseline.json
+#   python benchmarks/run_benchmarks.py --scales 1 10 --save-baseline
+#
+# Exit code 1 when any stage is slower or bigger than baseline by more than --tolerance.
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SCALES = [1, 10, 100]
+# Allowed slowdown / memory growth vs baseline before a stage counts as a regression
+TOLERANCE = 0.25
+# Slowdowns smaller than this (seconds) are run-to-run noise, whatever the ratio
+MIN_SLOWDOWN = 0.25
+# Timed runs per stage; the fastest one is reported
+REPEATS = 3
+
+
+def measure(fn, memory=True, repeats=REPEATS):
+    # (result, best seconds, peak MB or None); fn must be safe to call repeatedly
+    seconds = None
+    for _ in range(max(1, repeats)):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    if not memory:
+        return result, seconds, None
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def page_pulse(brain):
+    # What the Pulse Monitor page reads
+    brain.cube_query('enrolment', freq='Y')
+    brain.cube_query('demographic', freq='M')
+    brain.cube_query('biometric', freq='M')
+
+
+def page_allocator(brain):
+    # What the Infrastructure Allocator page reads for one district + the nationwide table
+    state = brain.states()[0]
+    district = brain.districts_for(state)[0]
+    brain.district_row(state, district)
+    table = brain.forecast_resources()
+    brain.forecast_demand(state=state, district=district)
+    brain.plan_resources(table, growth_rates=[0.0, 0.2, 0.5])
+
+
+def run_scale(scale, rows_per_scale, workers, work_dir, memory=True, repeats=REPEATS):
+    data_dir = os.path.join(work_dir, f"x{scale}")
+    stages = {}
+    
+    def record(name, fn, rows=None):
+        result, seconds, peak = measure(fn, memory, repeats)
+        stages[name] = {"seconds": round(seconds, 4), "peak_mb": None if peak is None else round(peak, 2)}
+        if rows is not None:
+            stages[name]["rows"] = rows
+        print(f"  {name:<22} {seconds:9.3f}s" + ("" if peak is None else f" {peak:10.1f} MB"))
+        return result
+    
+    print(f"Scale {scale}x ({scale * rows_per_scale:,} rows per dataset)")
+    start = time.perf_counter()
+    total_rows = sum(synthetic.generate(data_dir, scale, rows_per_scale).values())
+    print(f"  {'generate':<22} {time.perf_counter() - start:9.3f}s")
+    
+    # One raw demographic shard through the cleaner on its own
+    shard = sorted(os.listdir(os.path.join(data_dir, DATASETS['demographic'])))[0]
+    _, raw, _, _ = _read_shard(os.path.join(data_dir, DATASETS['demographic'], shard), 'demographic')
+    record("preprocess", lambda: AadhaarBrain._preprocess(raw.copy(), 'demographic'), rows=len(raw))
+    
+    def load(use_cache=True, streaming=False):
+        brain = AadhaarBrain(data_dir, workers=workers, use_cache=use_cache)
+        brain.load_data(streaming=streaming)
+        return brain
+    
+    cold = record("load_data_cold", lambda: load(use_cache=False), rows=total_rows)
+    record("load_data_streaming", lambda: load(use_cache=False, streaming=True), rows=total_rows)
+    load()  # fills the shard cache
+    brain = record("load_data_cached", load, rows=total_rows)
+    # Shards read back from the cache must report the rows they hold
+    kept = cold.rejection_report().set_index('dataset')['rows_kept']
+    assert brain.rejection_report().set_index('dataset')['rows_kept'].equals(kept), "cached load reports other row counts"
+    assert all(e["cached"] for entries in brain.load_report.values() for e in entries)
+    if HAS_DUCKDB:
+        # SQL on a brain that was never loaded, with nothing cached yet
+        with tempfile.TemporaryDirectory() as empty:
+            fresh = AadhaarBrain(data_dir, workers=workers, cache_dir=empty)
+            n = fresh.sql("SELECT count(*) AS n FROM enrolment")['n'][0]
+        assert n == kept['enrolment'], f"sql on a cold cache saw {n} enrolment rows, expected {kept['enrolment']}"
+    
+    # The app imports sklearn in warm_up, before any fit; do the same here so the
+    # first timed fit doesn't pay for the import
+    import sklearn.ensemble  # noqa: F401
+    record("train_anomaly_model", lambda: brain.train_anomaly_model(force=True))
+    record("train_forecaster", lambda: brain.train_forecaster(force=True))
+    record("page_pulse", lambda: page_pulse(brain))
+    record("page_anomaly", lambda: brain.train_anomaly_model())
+    record("page_allocator", lambda: page_allocator(brain))
+    
+    shutil.rmtree(data_dir, ignore_errors=True)
+    return stages
+
+
+def compare(results, baseline, tolerance):
+    # Rows of (scale, stage, metric, baseline, current, ratio) that grew past tolerance
+    regressions = []
+    for scale, stages in results.items():
+        for stage, current in stages.items():
+            before = baseline.get(scale, {}).get(stage)
+            if before is None:
+                continue
+            for metric in ("seconds", "peak_mb"):
+                if current[metric] is None or not before.get(metric):
+                    continue
+                if metric == "seconds" and current[metric] - before[metric] < MIN_SLOWDOWN:
+                    continue
+                if current[metric] > before[metric] * (1 + tolerance):
+                    regressions.append((scale, stage, metric, before[metric], current[metric],
+                                        round(current[metric] / before[metric], 2)))
+    return regressions
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the AadhaarBrain pipeline")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--rows", type=int, default=synthetic.ROWS_PER_SCALE, help="rows per dataset at 1x")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced memory runs")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="timed runs per stage (best one counts)")
+    parser.add_argument("--output", help="also write this run's results as JSON")
+    args = parser.parse_args()
+    
+    work_dir = tempfile.mkdtemp(prefix="drishti_bench_")
+    try:
+        results = {str(scale): run_scale(scale, args.rows, args.workers, work_dir, not args.no_memory, args.repeats)
+                   for scale in args.scales}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    run = {
+        "machine": {"python": platform.python_version(), "pandas": pd.__version__,
+                    "platform": platform.platform(), "cpus": os.cpu_count()},
+        "rows_per_scale": args.rows,
+        "workers": args.workers,
+        "repeats": args.repeats,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+    
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("rows_per_scale") != args.rows:
+        print(f"Baseline was recorded at {baseline.get('rows_per_scale')} rows per scale, not {args.rows}.")
+        return 0
+    if baseline.get("machine") != run["machine"]:
+        print("Note: baseline was recorded on a different machine/setup:", baseline.get("machine"))
+    
+    regressions = compare(results, baseline["results"], args.tolerance)
+    if not regressions:
+        print(f"No regressions vs baseline (tolerance {args.tolerance:.0%}).")
+        return 0
+    print(f"{len(regressions)} regression(s) vs baseline (tolerance {args.tolerance:.0%}):")
+    print(pd.DataFrame(regressions, columns=["scale", "stage", "metric", "baseline", "current", "ratio"])
+          .to_string(index=False))
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+import glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modeling import (DATASETS, SCHEMAS, STATE_REPLACEMENTS, DISTRICT_MAP,
+                      _age_columns, _canonical_states, _canonical_districts)
+
+# Synthetic UIDAI-style shards with the real column layouts and the kinds of dirty
+# names the cleaner has to fix. Geography (state, district, pincode) is taken from
+# the shards shipped in the repo, so district counts and pincode spread look real.
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# 1x scale = this many rows per dataset
+ROWS_PER_SCALE = 10_000
+# Real API dumps are split at this many rows per file
+SHARD_ROWS = 500_000
+DATE_RANGE = ("2025-03-01", "2025-12-31")
+
+# Share of rows with a dirty state / district, and of rows the cleaner must drop
+DIRTY_RATE = 0.05
+JUNK_RATE = 0.002
+JUNK_STATES = ['100000', 'Jaipur', 'Darbhanga', 'Nagpur']
+DISTRICT_SUFFIXES = [' *', '*', ' (Urban)', ' (R)', ' (Kar)', ' (M)']
+
+# Fallback if the repo shards are missing
+FALLBACK_GEOGRAPHY = [
+    ('Karnataka', 'Bengaluru', 560001), ('Karnataka', 'Mysuru', 570001), ('Karnataka', 'Bidar', 585330),
+    ('West Bengal', 'Kolkata', 700001), ('West Bengal', 'Howrah', 711101), ('Maharashtra', 'Pune', 411001),
+    ('Maharashtra', 'Mumbai', 400001), ('Madhya Pradesh', 'Shajapur', 465113), ('Gujarat', 'Ahmedabad', 380001),
+    ('Kerala', 'Thiruvananthapuram', 695001), ('Uttar Pradesh', 'Prayagraj', 211001), ('Delhi', 'New Delhi', 110001),
+]
+
+# Mean daily count per pincode for each age column; demographic updates surge in July
+AGE_MEANS = {'age_0_5': 2.0, 'age_5_17': 1.0, 'age_18_greater': 0.3,
+             'demo_age_5_17': 1.5, 'demo_age_17_': 8.0, 'bio_age_5_17': 4.0, 'bio_age_17_': 6.0}
+JULY_SURGE = {'demographic': 3.0}
+
+
+def seed_geography():
+    # Clean (state, district, pincode) triples from the repo's own shards
+    frames = []
+    for folder in DATASETS.values():
+        for path in glob.glob(os.path.join(REPO_DIR, folder, "*.csv")):
+            frames.append(pd.read_csv(path, usecols=['state', 'district', 'pincode'], dtype=str))
+    if not frames:
+        return pd.DataFrame(FALLBACK_GEOGRAPHY, columns=['state', 'district', 'pincode'])
+    geo = pd.concat(frames).drop_duplicates()
+    geo['state'] = _canonical_states(geo['state']).to_numpy()
+    geo['district'] = _canonical_districts(geo['district']).to_numpy()
+    geo['pincode'] = pd.to_numeric(geo['pincode'], errors='coerce')
+    geo = geo.dropna().drop_duplicates(['pincode']).astype({'pincode': 'int64'})
+    return geo.sort_values(['state', 'district', 'pincode']).reset_index(drop=True)
+
+
+def _aliases(mapping):
+    # canonical name -> raw spellings that clean to it
+    out = {}
+    for raw, canonical in mapping.items():
+        if raw != canonical:
+            out.setdefault(canonical, []).append(raw)
+    return out
+
+
+def _dirty(names, rate, aliases, rng, suffixes=()):
+    # Replace a share of names with an alias, a case/spacing variant or a suffix
+    names = names.astype(object).copy()
+    idx = np.flatnonzero(rng.random(len(names)) < rate)
+    for i, kind in zip(idx, rng.integers(0, 4, len(idx))):
+        name = names[i]
+        if kind == 0 and name in aliases:
+            names[i] = aliases[name][rng.integers(len(aliases[name]))]
+        elif kind == 1:
+            names[i] = name.upper() if rng.random() < 0.5 else name.lower()
+        elif kind == 2:
+            names[i] = f"  {name} "
+        elif suffixes:
+            names[i] = name + suffixes[rng.integers(len(suffixes))]
+    return names
+
+
+def generate_dataset(dataset, n_rows, geography, rng):
+    dates = pd.date_range(*DATE_RANGE, freq='D')
+    g = rng.integers(0, len(geography), n_rows)
+    d = rng.integers(0, len(dates), n_rows)
+    states = geography['state'].to_numpy(dtype=object)[g]
+    districts = geography['district'].to_numpy(dtype=object)[g]
+    
+    df = pd.DataFrame({
+        'date': dates.strftime('%d-%m-%Y').to_numpy(dtype=object)[d],
+        'state': _dirty(states, DIRTY_RATE, _aliases(STATE_REPLACEMENTS), rng),
+        'district': _dirty(districts, DIRTY_RATE, _aliases(DISTRICT_MAP), rng, DISTRICT_SUFFIXES),
+        'pincode': geography['pincode'].to_numpy()[g],
+    })
+    junk = rng.random(n_rows) < JUNK_RATE
+    df.loc[junk, 'state'] = rng.choice(JUNK_STATES, junk.sum())
+    
+    surge = np.where(dates[d].month == 7, JULY_SURGE.get(dataset, 1.0), 1.0)
+    for col in _age_columns(dataset):
+        df[col] = rng.poisson(AGE_MEANS[col] * surge)
+    return df[list(SCHEMAS[dataset])]
+
+
+def generate(out_dir, scale=1, rows_per_scale=ROWS_PER_SCALE, seed=0, shard_rows=SHARD_ROWS, geography=None):
+    # Writes <out_dir>/<dataset folder>/api_data_aadhar_<dataset>_<first>_<last>.csv
+    # for every dataset; returns {dataset: rows written}
+    rng = np.random.default_rng(seed)
+    geography = seed_geography() if geography is None else geography
+    n_rows = int(scale * rows_per_scale)
+    written = {}
+    for dataset, folder in DATASETS.items():
+        os.makedirs(os.path.join(out_dir, folder), exist_ok=True)
+        df = generate_dataset(dataset, n_rows, geography, rng)
+        for first in range(0, n_rows, shard_rows):
+            part = df.iloc[first:first + shard_rows]
+            name = f"{folder}_{first}_{first + len(part)}.csv"
+            part.to_csv(os.path.join(out_dir, folder, name), index=False)
+        written[dataset] = n_rows
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Write synthetic Aadhaar shards")
+    parser.add_argument("out_dir")
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--rows", type=int, default=ROWS_PER_SCALE, help="rows per dataset at 1x")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    written = generate(args.out_dir, args.scale, args.rows, args.seed)
+    print(f"Wrote {sum(written.values()):,} rows to {args.out_dir}: {written}")
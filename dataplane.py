@@ -0,0 +1,169 @@
+import pandas as pd
+import os
+import json
+import fcntl
+import pickle
+import shutil
+from contextlib import contextmanager
+
+
+# Shared data plane: one process writes the cleaned frames as Arrow IPC files,
+# every other process memory-maps them. Numeric and date columns come back as
+# views of the mapped pages and categorical columns are stored as their codes
+# (categories in the metadata), so N dashboard workers share one copy of the
+# rows through the OS page cache instead of holding N private ones.
+#
+# Layout of a plane directory:
+#
+#   gen-000001/            one published generation, never modified once renamed
+#     <name>.arrow         one file per frame
+#     state.pkl            small picklable extras (aggregates, models, reports)
+#   CURRENT                {"generation", "number", "frames", "meta", ...}
+#
+# A generation is written under gen-XXXXXX.tmp-<pid> and renamed when complete,
+# then CURRENT is swapped with os.replace, so readers see either the old
+# generation or the new one, never a half-written mix.
+
+PLANE_FORMAT = 1
+# Generations kept on disk; older ones are deleted (mapped readers keep their pages)
+KEEP_GENERATIONS = 2
+
+
+def _pa():
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+    return pa
+
+
+def current(plane_dir):
+    # The published pointer, or None when nothing (readable) was published yet
+    try:
+        with open(os.path.join(plane_dir, "CURRENT")) as fh:
+            pointer = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    return pointer if pointer.get("format") == PLANE_FORMAT else None
+
+
+@contextmanager
+def lock(plane_dir):
+    # Cross-process exclusive lock around building / publishing: flock on the LOCK
+    # file, held however long the build takes. The kernel drops it when the holder
+    # exits or crashes, so there is no staleness guess and the file is never deleted.
+    os.makedirs(plane_dir, exist_ok=True)
+    fd = os.open(os.path.join(plane_dir, "LOCK"), os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        yield
+    finally:
+        os.close(fd)
+
+
+def _write_frame(path, df):
+    # Categorical columns go in as their integer codes; returns the column layout
+    pa = _pa()
+    columns = {}
+    layout = []
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            columns[col] = values.cat.codes.to_numpy()
+            layout.append({"name": col, "categories": values.cat.categories.tolist()})
+        else:
+            columns[col] = values.to_numpy()
+            layout.append({"name": col})
+    table = pa.table(columns)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return layout
+
+
+def _read_frame(path, layout):
+    # Memory-maps the file; numeric columns and category codes stay views of the map
+    pa = _pa()
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    raw = table.to_pandas(split_blocks=True)
+    columns = {}
+    for spec in layout:
+        col = spec["name"]
+        if "categories" in spec:
+            dtype = pd.CategoricalDtype(pd.Index(spec["categories"]))
+            columns[col] = pd.Series(pd.Categorical.from_codes(raw[col].to_numpy(), dtype=dtype, validate=False),
+                                     copy=False)
+        else:
+            columns[col] = raw[col]
+    # copy=False keeps every column backed by the mapped pages
+    return pd.DataFrame(columns, copy=False)
+
+
+def publish(plane_dir, frames, state, meta=None):
+    # Writes a new generation and points CURRENT at it. Callers that may race with
+    # other writers hold lock(plane_dir). frames: {name: DataFrame or None}.
+    # Raises FileExistsError when the next generation already exists (another
+    # writer published it without the lock); nothing is overwritten.
+    os.makedirs(plane_dir, exist_ok=True)
+    previous = current(plane_dir)
+    number = (previous["number"] if previous else 0) + 1
+    name = f"gen-{number:06d}"
+    final = os.path.join(plane_dir, name)
+    if os.path.exists(final):
+        raise FileExistsError(f"{final} already exists; was it published without dataplane.lock()?")
+    tmp = f"{final}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    try:
+        layouts = {}
+        for frame_name, df in frames.items():
+            if df is not None:
+                layouts[frame_name] = _write_frame(os.path.join(tmp, frame_name + ".arrow"), df)
+        with open(os.path.join(tmp, "state.pkl"), "wb") as fh:
+            pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        # rename (not replace) never lands on a generation that appeared meanwhile
+        if os.path.exists(final):
+            raise FileExistsError(f"{final} already exists; was it published without dataplane.lock()?")
+        os.rename(tmp, final)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    pointer = {"format": PLANE_FORMAT, "generation": name, "number": number, "frames": layouts,
+               "meta": meta or {}, "published_at": pd.Timestamp.now().isoformat(timespec='seconds'),
+               "pid": os.getpid()}
+    target = os.path.join(plane_dir, "CURRENT")
+    with open(f"{target}.tmp-{os.getpid()}", "w") as fh:
+        json.dump(pointer, fh)
+    os.replace(f"{target}.tmp-{os.getpid()}", target)
+    _prune(plane_dir, number)
+    return pointer
+
+
+def attach(plane_dir, pointer=None):
+    # -> (pointer, {name: DataFrame}, state) of the current (or given) generation,
+    # or None when nothing is published or the generation vanished meanwhile
+    pointer = pointer or current(plane_dir)
+    if pointer is None:
+        return None
+    folder = os.path.join(plane_dir, pointer["generation"])
+    try:
+        frames = {name: _read_frame(os.path.join(folder, name + ".arrow"), layout)
+                  for name, layout in pointer["frames"].items()}
+        with open(os.path.join(folder, "state.pkl"), "rb") as fh:
+            state = pickle.load(fh)
+    except (OSError, pickle.UnpicklingError) as e:
+        print(f"Could not attach {folder}: {e}")
+        return None
+    return pointer, frames, state
+
+
+def _prune(plane_dir, newest):
+    for entry in os.listdir(plane_dir):
+        if not entry.startswith("gen-"):
+            continue
+        stem = entry[4:].split(".")[0]
+        if stem.isdigit() and int(stem) <= newest - KEEP_GENERATIONS:
+            # Processes still mapping these files keep reading them until they refresh
+            shutil.rmtree(os.path.join(plane_dir, entry), ignore_errors=True)
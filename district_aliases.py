@@ -0,0 +1,172 @@
+import pandas as pd
+import os
+import re
+import json
+import glob
+import difflib
+
+
+# Compiled district alias table. Fuzzy matching is far too slow to run per row,
+# so it runs offline over the distinct (state, district) pairs only and the result
+# is saved as district_aliases.json ("states": {state: {name: canonical}}, on top
+# of the manual DISTRICT_MAP). At load time it becomes one dict keyed by
+# (state, name), so cleaning is a plain lookup per distinct pair. Rebuild after
+# new data arrives and review the printed matches:
+#
+#   python district_aliases.py "/path/to/uidai data "
+
+ALIAS_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "district_aliases.json")
+# Bump when the JSON layout changes
+TABLE_FORMAT = 1
+
+# A spelling is an alias candidate when it squashes to the same letters as a known
+# district ("Banas Kantha" / "Banaskantha") or is this similar to one (difflib ratio)
+SIMILARITY_CUTOFF = 0.8
+# ...and is only accepted if at least this share of its pincodes belong to that
+# district too. Different districts with similar names (Solapur / Kolhapur, Etah /
+# Etawah) serve disjoint pincodes; two spellings of one district share them.
+MIN_PINCODE_OVERLAP = 0.3
+# Names that differ in one of these words are different districts (North / South
+# 24 Parganas, Bengaluru / Bengaluru Rural), however similar the rest is
+QUALIFIERS = re.compile(r'\b(north|south|east|west|northern|southern|eastern|western|central|'
+                        r'upper|lower|rural|urban|city|new|old|\d+)\b', re.IGNORECASE)
+
+
+def _squash(name):
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+def _qualifiers(name):
+    return sorted(q.lower() for q in QUALIFIERS.findall(name))
+
+
+def compile_manual(mapping):
+    # Follow chains (a -> b, b -> c becomes a -> c) so one lookup is enough.
+    # A cycle means two entries contradict each other.
+    compiled = {}
+    for name in mapping:
+        seen = [name]
+        target = mapping[name]
+        while target in mapping and mapping[target] != target:
+            if target in seen:
+                raise ValueError(f"Conflicting district aliases: {' -> '.join(seen + [target])}")
+            seen.append(target)
+            target = mapping[target]
+        if target != name:
+            compiled[name] = target
+    return compiled
+
+
+def empty_table():
+    return {"format": TABLE_FORMAT, "version": 0, "states": {}}
+
+
+def build_table(pairs, manual, previous=None):
+    # pairs: one row per distinct (state, district, pincode) with a 'rows' count,
+    # districts already normalised and passed through `manual`.
+    # Within each state, spellings are visited most common first (names the manual
+    # map points at come before everything); each one either becomes a district of
+    # its own or an alias of an earlier one.
+    pinned = set(manual.values())
+    states = {}
+    evidence = {}
+    for state, group in pairs.groupby('state', sort=True):
+        pins = group.groupby('district')['pincode'].agg(set)
+        rows = group.groupby('district')['rows'].sum()
+        order = sorted(rows.index, key=lambda d: (d not in pinned, -rows[d], d))
+        canonical = []
+        for name in order:
+            candidates = [c for c in canonical if _squash(c) == _squash(name)]
+            candidates += difflib.get_close_matches(name, canonical, n=3, cutoff=SIMILARITY_CUTOFF)
+            match = None
+            for c in candidates:
+                if _qualifiers(c) != _qualifiers(name):
+                    continue
+                overlap = len(pins[name] & pins[c]) / len(pins[name])
+                if overlap >= MIN_PINCODE_OVERLAP:
+                    match = c
+                    ratio = difflib.SequenceMatcher(None, name, c).ratio()
+                    evidence.setdefault(state, {})[name] = {"canonical": c, "similarity": round(ratio, 3),
+                                                            "pincode_overlap": round(overlap, 3),
+                                                            "rows": int(rows[name])}
+                    break
+            if match is None:
+                canonical.append(name)
+            else:
+                states.setdefault(state, {})[name] = match
+
+    table = empty_table()
+    table["version"] = (previous or {}).get("version", 0) + 1
+    table["built_at"] = pd.Timestamp.now().isoformat(timespec='seconds')
+    table["params"] = {"similarity_cutoff": SIMILARITY_CUTOFF, "min_pincode_overlap": MIN_PINCODE_OVERLAP}
+    table["states"] = states
+    table["evidence"] = evidence
+    return table
+
+
+def load_table(path=ALIAS_TABLE_PATH):
+    # {'version', 'states': {(state, name): canonical}}. Without a
+    # (readable) table file there are no state-scoped aliases.
+    try:
+        with open(path) as fh:
+            table = json.load(fh)
+        if table.get("format") != TABLE_FORMAT:
+            raise ValueError(f"unsupported format {table.get('format')}")
+    except (OSError, ValueError) as e:
+        print(f"District alias table not loaded ({e}); using the manual map only.")
+        table = empty_table()
+    scoped = {(state, name): canonical for state, names in table["states"].items()
+              for name, canonical in names.items()}
+    return {"version": table["version"], "states": scoped}
+
+
+def collect_pairs(data_dir):
+    # Distinct (state, district, pincode) over every shard, cleaned the way
+    # _preprocess cleans them before the state-scoped lookup
+    from modeling import DATASETS, _canonical_states, _canonical_districts
+    counts = []
+    for folder in DATASETS.values():
+        for path in sorted(glob.glob(os.path.join(data_dir, folder, "*.csv"))):
+            df = pd.read_csv(path, usecols=['state', 'district', 'pincode'], dtype=str)
+            counts.append(df.value_counts(dropna=False).rename('rows').reset_index())
+    if not counts:
+        raise ValueError(f"No shards found under {data_dir}")
+    pairs = pd.concat(counts).groupby(['state', 'district', 'pincode'], dropna=False)['rows'].sum().reset_index()
+
+    states = pairs['state'].drop_duplicates()
+    pairs['state'] = pairs['state'].map(dict(zip(states, _canonical_states(states))))
+    districts = pairs['district'].drop_duplicates()
+    pairs['district'] = pairs['district'].map(dict(zip(districts, _canonical_districts(districts))))
+    return pairs.dropna(subset=['state']).groupby(['state', 'district', 'pincode'])['rows'].sum().reset_index()
+
+
+def main():
+    import argparse
+    from modeling import DISTRICT_MAP
+    parser = argparse.ArgumentParser(description="Rebuild the state-scoped district alias table")
+    parser.add_argument("data_dir")
+    parser.add_argument("--output", default=ALIAS_TABLE_PATH)
+    args = parser.parse_args()
+
+    try:
+        with open(args.output) as fh:
+            previous = json.load(fh)
+    except (OSError, ValueError):
+        previous = None
+    pairs = collect_pairs(args.data_dir)
+    table = build_table(pairs, DISTRICT_MAP, previous)
+
+    for state, names in table["evidence"].items():
+        for name, ev in names.items():
+            print(f"{state}: {name!r} -> {ev['canonical']!r} (similarity {ev['similarity']:.2f}, "
+                  f"pincode overlap {ev['pincode_overlap']:.2f}, {ev['rows']:,} rows)")
+    n_aliases = sum(len(v) for v in table["states"].values())
+    with open(args.output + ".tmp", "w") as fh:
+        json.dump(table, fh, indent=1, sort_keys=True, ensure_ascii=False)
+    os.replace(args.output + ".tmp", args.output)
+    print(f"Wrote version {table['version']} to {args.output}: {n_aliases} state-scoped aliases "
+          f"over {pairs[['state', 'district']].drop_duplicates().shape[0]} names.")
+
+
+if __name__ == "__main__":
+    main()
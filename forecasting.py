@@ -0,0 +1,124 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import time
+
+
+# Monthly update demand per district (demographic + biometric), forecast with one
+# shared seasonal model: log1p(load) ~ level + trend + calendar-month effect.
+# Every district uses the same design matrix, so all of them are fitted in a
+# single ridge solve (months x months system, districts as right-hand sides).
+
+# Bump when the saved forecaster layout or the model changes
+FORECAST_VERSION = 1
+FORECAST_DATASETS = ('demographic', 'biometric')
+FORECAST_HORIZON = 6
+
+# Ridge penalties pulling each district's trend / month effects towards the
+# national ones. A district with one July on record keeps a third of its own
+# July effect; with several Julys its own pattern dominates.
+TREND_RIDGE = 1.0
+SEASON_RIDGE = 2.0
+# Future trend steps are damped (Holt-style) so short histories don't explode
+TREND_DAMPING = 0.9
+# z for the upper band used as the safety margin (~90% one-sided)
+UPPER_Z = 1.28
+
+
+def monthly_series(cube_m, datasets=FORECAST_DATASETS):
+    # Monthly cube -> (first month, (state, district) keys, months x districts matrix).
+    # Months with no rows for a district count as zero load.
+    rows = cube_m[cube_m['dataset'].isin(list(datasets)).to_numpy()]
+    if rows.empty:
+        return None, pd.DataFrame(columns=['state', 'district']), np.zeros((0, 0))
+    totals = rows.groupby(['date', 'state', 'district'], observed=True)['total'].sum().reset_index()
+
+    month = totals['date'].values.astype('datetime64[M]').astype('int64')
+    start = month.min()
+    keys = totals[['state', 'district']].astype(str)
+    codes, uniques = pd.MultiIndex.from_frame(keys).factorize(sort=True)
+    Y = np.zeros((month.max() - start + 1, len(uniques)))
+    np.add.at(Y, (month - start, codes), totals['total'].to_numpy(dtype='float64'))
+    return np.datetime64(int(start), 'M'), pd.DataFrame(list(uniques), columns=['state', 'district']), Y
+
+
+def _design(months, t_center):
+    # One row per month: [level, trend (per year), 12 calendar-month dummies]
+    months = np.asarray(months)
+    X = np.zeros((len(months), 14))
+    X[:, 0] = 1.0
+    X[:, 1] = (months - t_center) / 12.0
+    X[np.arange(len(months)), 2 + months % 12] = 1.0
+    return X
+
+
+def _ridge(X, Y, penalty, prior):
+    # Solve (X'X + P) B = X'Y + P B0 for every column of Y at once
+    P = np.diag(penalty)
+    return np.linalg.solve(X.T @ X + P, X.T @ Y + P @ prior)
+
+
+def fit(start, keys, Y):
+    # start: first month (datetime64[M]), keys: (state, district) frame, Y: months x districts
+    t0 = time.perf_counter()
+    months = np.arange(Y.shape[0]) + start.astype('int64')
+    t_center = months.mean()
+    X = _design(months, t_center)
+    logY = np.log1p(Y)
+
+    # National pattern first (average district), then every district shrunk towards it.
+    # The level is never penalised, so each district keeps its own scale.
+    penalty = np.array([0.0, TREND_RIDGE] + [SEASON_RIDGE] * 12)
+    national = _ridge(X, logY.mean(axis=1, keepdims=True), penalty, np.zeros((14, 1)))
+    coef = _ridge(X, logY, penalty, np.repeat(national, logY.shape[1], axis=1))
+
+    resid = logY - X @ coef
+    dof = max(Y.shape[0] - 2, 1)
+    return {
+        "version": FORECAST_VERSION,
+        "start": start,
+        "n_months": Y.shape[0],
+        "t_center": t_center,
+        "keys": keys,
+        "coef": coef,
+        "national": national[:, 0],
+        "sigma": np.sqrt((resid ** 2).sum(axis=0) / dof),
+        "last_load": Y[-1],
+        "mean_load": Y.mean(axis=0),
+        "fit_seconds": round(time.perf_counter() - t0, 4),
+        "trained_at": pd.Timestamp.now().isoformat(timespec='seconds'),
+    }
+
+
+def predict(model, horizon=FORECAST_HORIZON):
+    # horizon x districts matrices of point forecasts and upper bands, plus the months
+    last = model["start"].astype('int64') + model["n_months"] - 1
+    months = last + np.arange(1, horizon + 1)
+    X = _design(months, model["t_center"])
+    # Damped trend: step k ahead moves phi + phi^2 + ... + phi^k months, not k
+    steps = np.cumsum(TREND_DAMPING ** np.arange(1, horizon + 1))
+    X[:, 1] = (last + steps - model["t_center"]) / 12.0
+    log_pred = X @ model["coef"]
+    point = np.maximum(np.expm1(log_pred), 0)
+    upper = np.maximum(np.expm1(log_pred + UPPER_Z * model["sigma"]), 0)
+    return months.astype('datetime64[M]'), point, upper
+
+
+def forecast_frame(model, horizon=FORECAST_HORIZON):
+    # Long frame: state, district, date, forecast, upper
+    months, point, upper = predict(model, horizon)
+    keys = model["keys"]
+    n = len(keys)
+    frame = keys.iloc[np.tile(np.arange(n), horizon)].reset_index(drop=True)
+    frame['date'] = np.repeat(months.astype('datetime64[s]'), n)
+    frame['forecast'] = point.ravel()
+    frame['upper'] = upper.ravel()
+    return frame
+
+
+def fingerprint(start, keys, Y):
+    # Identifies the exact monthly series a forecaster was fitted on
+    digest = hashlib.sha1(pd.util.hash_pandas_object(keys, index=False).values.tobytes())
+    digest.update(np.ascontiguousarray(Y).tobytes())
+    digest.update(f"{FORECAST_VERSION}:{start}:{TREND_RIDGE}:{SEASON_RIDGE}:{TREND_DAMPING}".encode())
+    return digest.hexdigest()[:16]
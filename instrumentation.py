@@ -0,0 +1,183 @@
+import pandas as pd
+import time
+import threading
+import io
+import cProfile
+import pstats
+import tracemalloc
+
+
+# Stage-level timings, row counts, memory deltas and optional cProfile captures.
+# Code is instrumented with
+#
+#     with metrics.stage("preprocess.dates") as s:
+#         ...
+#         s.rows = len(df)
+#
+# When metrics are disabled, stage() hands back one shared no-op object, so the
+# instrumented paths pay a method call per stage and nothing else. One Metrics is
+# shared by the app's threads (page runs, warm-up, background jobs), so updates
+# are made under a lock.
+
+# Lines of the cProfile report kept per capture
+PROFILE_LINES = 40
+
+
+class _NullStage:
+    # Shared stand-in when metrics are off: enters, exits and swallows rows
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, metrics, name, rows):
+        self.metrics = metrics
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.mem = tracemalloc.get_traced_memory()[0] if self.metrics.memory else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        mem = None
+        if self.mem is not None and tracemalloc.is_tracing():
+            mem = tracemalloc.get_traced_memory()[0] - self.mem
+        self.metrics.add(self.name, seconds, self.rows, mem)
+        return False
+
+
+class Metrics:
+    # enabled: record stages. memory: also record traced-memory deltas (tracemalloc,
+    # slows things down noticeably). profile: wrap top-level calls in cProfile.
+    # Switching memory (or enabled) off stops the tracing this instance started.
+    def __init__(self, enabled=False, memory=False, profile=False):
+        self._enabled = self._memory = self._tracing = False
+        self._lock = threading.RLock()
+        self.enabled = enabled
+        self.memory = memory
+        self.profile = profile
+        self.stages = {}     # name -> {'calls', 'seconds', 'max_seconds', 'rows', 'mem_delta'}
+        self.profiles = {}   # name -> pstats report text of the last capture
+        self._profiling = False
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = bool(value)
+        self._stop_tracing()
+
+    @property
+    def memory(self):
+        return self._memory
+
+    @memory.setter
+    def memory(self, value):
+        self._memory = bool(value)
+        self._stop_tracing()
+
+    def _stop_tracing(self):
+        # Every allocation stays traced (and slower) until tracemalloc is stopped
+        with self._lock:
+            if self._tracing and not (self._enabled and self._memory):
+                tracemalloc.stop()
+                self._tracing = False
+
+    def stage(self, name, rows=None):
+        if not self.enabled:
+            return _NULL_STAGE
+        if self.memory and not tracemalloc.is_tracing():
+            with self._lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._tracing = True
+        return _Stage(self, name, rows)
+
+    def add(self, name, seconds, rows=None, mem_delta=None, calls=1):
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                entry = self.stages[name] = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                             "rows": None, "mem_delta": None}
+            entry["calls"] += calls
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            if rows is not None:
+                entry["rows"] = (entry["rows"] or 0) + int(rows)
+            if mem_delta is not None:
+                entry["mem_delta"] = (entry["mem_delta"] or 0) + int(mem_delta)
+
+    def merge(self, stages):
+        # Fold in the stages recorded elsewhere (e.g. a pool worker's to_dict())
+        with self._lock:
+            for name, entry in (stages or {}).items():
+                self.add(name, entry["seconds"], entry["rows"], entry["mem_delta"], entry["calls"])
+                self.stages[name]["max_seconds"] = max(self.stages[name]["max_seconds"], entry["max_seconds"])
+
+    def profiled(self, name):
+        # cProfile around a top-level call; nested calls run under the outer capture.
+        # Only one capture runs at a time (cProfile can't nest), other threads skip it.
+        if not (self.enabled and self.profile):
+            return _NULL_STAGE
+        with self._lock:
+            if self._profiling:
+                return _NULL_STAGE
+            self._profiling = True
+        return _Profile(self, name)
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.profiles = {}
+
+    def to_dict(self):
+        with self._lock:
+            return {name: dict(entry) for name, entry in self.stages.items()}
+
+    def report(self):
+        # One row per stage, slowest first
+        with self._lock:
+            rows = [{"stage": name, **entry} for name, entry in self.stages.items()]
+        report = pd.DataFrame(rows, columns=["stage", "calls", "seconds", "max_seconds", "rows", "mem_delta"])
+        report["rows_per_sec"] = report["rows"] / report["seconds"].where(report["seconds"] > 0)
+        report["mem_delta_mb"] = report["mem_delta"] / 2**20
+        return (report.drop(columns="mem_delta").sort_values("seconds", ascending=False)
+                .reset_index(drop=True).round(4))
+
+
+class _Profile:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        with self.metrics._lock:
+            self.metrics.profiles[self.name] = out.getvalue()
+            self.metrics._profiling = False
+        return False
+
+
+# Shared disabled instance for code paths that take an optional metrics object
+NULL_METRICS = Metrics()
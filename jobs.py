@@ -0,0 +1,151 @@
+import pandas as pd
+import time
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Background jobs for the app: model fits and heavy aggregations run on one small
+# thread pool that every Streamlit session shares (it hangs off the cached brain),
+# so a long fit no longer holds up the script run that asked for it. Jobs are
+# keyed by what they compute; submitting a key that is already queued or running
+# hands back that job instead of starting a second identical one. Code running
+# inside a job reports how far it got with
+#
+#     jobs.progress(0.5, "Fitting per-state forests")
+#
+# which does nothing when called outside a job, so the same functions still run
+# synchronously (scripts, benchmarks) unchanged.
+
+# Jobs running at once; the fits themselves already use every core
+JOB_WORKERS = 2
+# Finished jobs remembered (for "last result" and the Diagnostics table)
+JOB_HISTORY = 50
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# The job the current pool thread is running, read by progress()
+_current = threading.local()
+
+
+def progress(fraction, message=None):
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job.update(fraction, message)
+
+
+class Job:
+    def __init__(self, key, fn, args, kwargs):
+        self.key = key
+        self.kind = key[0] if isinstance(key, tuple) else key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Queued"
+        self.result = None
+        self.error = None
+        self.submitted_at = pd.Timestamp.now()
+        self.started_at = None
+        self.finished_at = None
+        self.seconds = None
+        self._done = threading.Event()
+
+    def update(self, fraction, message=None):
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        # Blocks until the job finished; returns its result or raises its error
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Job {self.key!r} still {self.status} after {timeout}s")
+        if self.status == FAILED:
+            raise RuntimeError(f"Job {self.key!r} failed: {self.error}")
+        return self.result
+
+    def _run(self):
+        _current.job = self
+        self.status, self.message = RUNNING, "Running"
+        self.started_at = pd.Timestamp.now()
+        start = time.perf_counter()
+        try:
+            self.result = self.fn(*self.args, **self.kwargs)
+            self.status, self.progress, self.message = DONE, 1.0, "Done"
+        except Exception as e:
+            self.status, self.message = FAILED, "Failed"
+            self.error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            _current.job = None
+            self.seconds = round(time.perf_counter() - start, 3)
+            self.finished_at = pd.Timestamp.now()
+            self._done.set()
+
+    def to_dict(self):
+        return {"key": repr(self.key), "status": self.status, "progress": round(self.progress, 3),
+                "message": self.message, "error": self.error, "submitted_at": self.submitted_at,
+                "started_at": self.started_at, "seconds": self.seconds}
+
+
+class JobManager:
+    # The pool threads are created on first submit, so a brain that never runs a
+    # background job costs nothing
+    def __init__(self, workers=JOB_WORKERS, history=JOB_HISTORY):
+        self.workers = workers
+        self.history = history
+        self._pool = None
+        self._jobs = OrderedDict()     # key -> latest Job for that key
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        # Start fn(*args, **kwargs) in the background, or return the job already
+        # queued/running under the same key
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.done():
+                return job
+            job = Job(key, fn, args, kwargs)
+            self._jobs[key] = job
+            self._jobs.move_to_end(key)
+            self._trim()
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="drishti-job")
+            self._pool.submit(job._run)
+        return job
+
+    def _trim(self):
+        # Drop the oldest finished jobs beyond `history`; running ones always stay
+        finished = [k for k, j in self._jobs.items() if j.done()]
+        for key in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[key]
+
+    def get(self, key):
+        # Latest job submitted under key (running or finished), or None
+        with self._lock:
+            return self._jobs.get(key)
+
+    def latest(self, kind, status=None):
+        # Most recently submitted job of a kind (first element of its key),
+        # optionally only one that finished with the given status
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                if job.kind == kind and (status is None or job.status == status):
+                    return job
+        return None
+
+    def running(self):
+        with self._lock:
+            return [j for j in self._jobs.values() if not j.done()]
+
+    def report(self):
+        # One row per remembered job, newest first
+        with self._lock:
+            rows = [j.to_dict() for j in reversed(self._jobs.values())]
+        return pd.DataFrame(rows, columns=["key", "status", "progress", "message", "error",
+                                           "submitted_at", "started_at", "seconds"])
@@ -2,260 +2,1997 @@ import pandas as pd
 import numpy as np
 import os
 import glob
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-from difflib import get_close_matches
+import time
+import json
+import hashlib
+import inspect
+import re
+import threading
+import multiprocessing
+import importlib.util
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import forecasting
+import surge
+import jobs
+import dataplane
+import district_aliases
+from instrumentation import Metrics, NULL_METRICS
+
+
+# Bump when the cache layout changes; cleaning-rule changes are picked up automatically
+CACHE_FORMAT = 2
+
+# pyarrow (needed by pandas for Parquet) is only imported when the cache is used.
+# sklearn and joblib are likewise imported inside the functions that fit or
+# persist models, so importing this module stays cheap for the app's first paint.
+HAS_PARQUET = importlib.util.find_spec("pyarrow") is not None
+# duckdb (in requirements.txt, but only AadhaarBrain.sql needs it)
+HAS_DUCKDB = importlib.util.find_spec("duckdb") is not None
+
+# Where the UIDAI dumps live unless a data_dir is given
+DATA_DIR = os.environ.get("DRISHTI_DATA_DIR", "/Users/rakeshmondal/Downloads/uidai data ")
+
+# Typo Fixes
+STATE_REPLACEMENTS = {
+    'West Bangal': 'West Bengal',
+    'Westbengal': 'West Bengal',
+    'West  Bengal': 'West Bengal',
+    'Chhatisgarh': 'Chhattisgarh',
+    'Uttaranchal': 'Uttarakhand',
+    'Pondicherry': 'Puducherry',
+    'Orissa': 'Odisha',
+    'Andhra Pradesh': 'Andhra Pradesh',
+    'West Bengli': 'West Bengal',
+    'Jammu And Kashmir': 'Jammu & Kashmir',
+    'Dadra And Nagar Haveli': 'Dadra & Nagar Haveli',
+    'Daman And Diu': 'Daman & Diu',
+    'Andaman And Nicobar Islands': 'Andaman & Nicobar Islands'
+}
+
+# Whitelist of valid Indian States and Union Territories (36 total)
+VALID_STATES = {
+    # States (28)
+    'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar', 'Chhattisgarh',
+    'Goa', 'Gujarat', 'Haryana', 'Himachal Pradesh', 'Jharkhand',
+    'Karnataka', 'Kerala', 'Madhya Pradesh', 'Maharashtra', 'Manipur',
+    'Meghalaya', 'Mizoram', 'Nagaland', 'Odisha', 'Punjab',
+    'Rajasthan', 'Sikkim', 'Tamil Nadu', 'Telangana', 'Tripura',
+    'Uttar Pradesh', 'Uttarakhand', 'West Bengal',
+    
+    # Union Territories (8)
+    'Andaman & Nicobar Islands', 'Chandigarh', 
+    'Dadra & Nagar Haveli And Daman & Diu',
+    'Delhi', 'Jammu & Kashmir', 'Ladakh', 'Lakshadweep', 'Puducherry'
+}
+
+# 1. Manual Mappings (Factual/Official/Phonetic Name Changes)
+DISTRICT_MAP = {
+    # West Bengal (Phonetic fixes)
+    'Haora': 'Howrah', 'Hugli': 'Hooghly', 'Midnapore': 'Paschim Medinipur', 
+    'North 24 Paraganas': 'North 24 Parganas', 'South 24 Paraganas': 'South 24 Parganas',
+    'North 24 Pgns': 'North 24 Parganas', 'South 24 Pgns': 'South 24 Parganas',
+    'Parganas North': 'North 24 Parganas', 'Parganas South': 'South 24 Parganas',
+    'Calcutta': 'Kolkata', 'South Dumdum': 'South Dum Dum',
+    
+    # Maharashtra (Official Changes & Typos)
+    'Ahmednagar': 'Ahilyanagar', 'Aurangabad': 'Chhatrapati Sambhaji Nagar',
+    'Osmanabad': 'Dharashiv', 'Beed': 'Bid', 'Bombay': 'Mumbai', 'Poona': 'Pune',
+    'Mumbai Sub Urban': 'Mumbai Suburban', 'Raigarh': 'Raigad',
+    
+    # Kerala (Anglicized vs Local)
+    'Trivandrum': 'Thiruvananthapuram', 'Quilon': 'Kollam', 'Alleppey': 'Alappuzha',
+    'Trichur': 'Thrissur', 'Palghat': 'Palakkad', 'Calicut': 'Kozhikode', 
+    'Cannanore': 'Kannur', 'Cochin': 'Kochi',
+    
+    # Karnataka (Previously added + refinements)
+    'Bangalore': 'Bengaluru', 'Bangalore Rural': 'Bengaluru Rural', 'Bangalore South': 'Bengaluru South',
+    'Belgaum': 'Belagavi', 'Bellary': 'Ballari', 'Mysore': 'Mysuru', 'Gulbarga': 'Kalaburagi',
+    'Shimoga': 'Shivamogga', 'Tumkur': 'Tumakuru', 'Bijapur': 'Vijayapura', 'Chikmagalur': 'Chikkamagaluru',
+    'Chickmagalur': 'Chikkamagaluru', 'Chamrajanagar': 'Chamarajanagar', 'Chamrajnagar': 'Chamarajanagar',
+    'Hasan': 'Hassan', 'Davangere': 'Davanagere',
+    
+    # Uttar Pradesh (Refined)
+    'Allahabad': 'Prayagraj', 'Bara Banki': 'Barabanki', 'Rae Bareli': 'Raebareli',
+    'Budaun': 'Badaun', 'Sant Ravidas Nagar': 'Bhadohi', 'Kheri': 'Lakhimpur Kheri',
+    'Firozpur': 'Ferozepur',
+    
+    # Andhra Pradesh / Telangana (Refined)
+    'Vizag': 'Visakhapatnam', 'Vizianagaram': 'Vijayanagaram', 'Karim Nagar': 'Karimnagar',
+    'K.V.Rangareddy': 'K.V. Rangareddy', 'Mahabub Nagar': 'Mahabubnagar',
+    'Mahbubnagar': 'Mahabubnagar', 'Ananthapur': 'Anantapur', 'Ananthapuramu': 'Anantapur',
+    'Cuddapah': 'Y. S. R', 'Kadapa': 'Y. S. R',
+    
+    # Others
+    'Andamans': 'Andaman', 'Nicobars': 'Nicobar', 'Leh Ladakh': 'Leh',
+    'Janjgir - Champa': 'Janjgir-Champa', 'Janjgir Champa': 'Janjgir-Champa',
+    'Banaskantha': 'Banas Kantha', 'Panch Mahals': 'Panchmahals', 'Sabarkantha': 'Sabar Kantha',
+    'Surendra Nagar': 'Surendranagar', 'Ahmadabad': 'Ahmedabad', 'Dohad': 'Dahod',
+    'Yamuna Nagar': 'Yamunanagar', 'S.A.S Nagar': 'Sahibzada Ajit Singh Nagar',
+    'Sas Nagar': 'Sahibzada Ajit Singh Nagar', 'Kaimur': 'Kaimur'
+}
+
+# Chains resolved (a -> b -> c is looked up as a -> c); contradicting entries fail here
+DISTRICT_GLOBAL_MAP = district_aliases.compile_manual(DISTRICT_MAP)
+
+# 2. Fuzzy Matches, scoped to a state (built offline by district_aliases.py, since
+# the fuzzy logic is too slow for millions of rows): {(state, name): canonical}
+DISTRICT_ALIASES = district_aliases.load_table()
+
+
+def _canonical_states(values):
+    # values: Series of distinct raw state values -> cleaned names, NaN = drop the row
+    s = values.astype(str).str.strip().str.title()
+    
+    # Remove numeric states (Junk data)
+    numeric = s.str.match(r'^\d+$')
+    
+    s = s.replace(STATE_REPLACEMENTS)
+    
+    # Filter out invalid states (cities, typos, etc.)
+    # Remove city names appearing as states (heuristic: if it's not in a known list, potentially drop? 
+    # Or just rely on the user ignoring them. 'Jaipur' as state is bad.
+    # Let's keep it simple for now and rely on the major fixes).
+    return s.where(~numeric & s.isin(VALID_STATES))
+
+
+def _state_rejections(values):
+    # Rule behind each rejected state value (only looked at for the dropped ones)
+    numeric = values.astype(str).str.strip().str.match(r'^\d+$').to_numpy(dtype=bool)
+    return np.where(numeric, 'state_numeric', 'state_invalid')
+
+
+def _canonical_districts(values):
+    # values: Series of distinct raw district values -> cleaned names
+    s = values.astype(str).str.strip().str.title()
+    
+    # Remove trailing asterisks and other special chars
+    s = s.str.replace(r'\s*\*+\s*$', '', regex=True)
+    
+    # Remove parenthetical notes like (Bh), (Kar), (Mh), (R), (M), (Urban), etc.
+    s = s.str.replace(r'\s*\([^)]*\)', '', regex=True)
+    
+    # Clean up extra spaces
+    s = s.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+    # Second pass for notes stacked as 'Name * (X)'
+    s = s.str.replace(r'\s*\*+\s*$', '', regex=True)
+    s = s.str.replace(r'\s*\([^)]*\)', '', regex=True)
+    s = s.str.replace(r'\s+', ' ', regex=True).str.strip().str.title()
+
+    return s.map(lambda name: DISTRICT_GLOBAL_MAP.get(name, name))
+
+
+def _apply_districts(df):
+    # District names are cleaned like _apply_canonical does (distinct values only),
+    # then the state-scoped aliases are looked up once per distinct (state, district)
+    # pair, so 'Pakaur' can fold into 'Pakur' in Jharkhand without touching other states.
+    codes, uniques = pd.factorize(df['district'], use_na_sentinel=False)
+    names = _canonical_districts(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+    
+    scoped = DISTRICT_ALIASES["states"]
+    if scoped and len(df) and 'state' in df.columns:
+        # 'state' is already a categorical here; its codes x district codes is the pair key
+        state_codes = df['state'].cat.codes.to_numpy(dtype='int64')
+        pair_codes, pairs = pd.factorize(state_codes * len(uniques) + codes)
+        states = df['state'].cat.categories.to_numpy(dtype=object)
+        resolved = np.array([scoped.get((states[p // len(uniques)], names[p % len(uniques)]), names[p % len(uniques)])
+                             for p in pairs], dtype=object)
+        row_values, row_codes = resolved, pair_codes
+    else:
+        row_values, row_codes = names, codes
+    
+    new_codes, categories = pd.factorize(row_values, sort=True)
+    df['district'] = pd.Categorical.from_codes(new_codes[row_codes], categories=categories)
+    return df
+
+
+def _apply_canonical(df, col, clean_fn, reject_fn=None, rejects=None):
+    # Factorize the column, run clean_fn over the distinct values only and map the
+    # result back through the integer codes. Rows whose value cleans to NaN are dropped.
+    # Missing values are kept as their own key so they clean exactly like before ('nan').
+    # rejects: dict filled with {rule: row labels} of the dropped rows, the rule coming
+    # from reject_fn(distinct values) or '<col>_missing' for empty cells.
+    codes, uniques = pd.factorize(df[col], use_na_sentinel=col == 'state')
+    cleaned = clean_fn(pd.Series(uniques, dtype=object))
+    
+    # Several raw spellings usually collapse onto one canonical name. Sorted categories
+    # keep groupby output in the same (alphabetical) order as plain strings.
+    new_codes, categories = pd.factorize(cleaned, sort=True)
+    row_codes = np.append(new_codes, -1)[codes]  # code -1 (NaN in the raw column) stays -1
+    
+    keep = row_codes >= 0
+    if not keep.all():
+        if rejects is not None:
+            rules = np.full(len(uniques) + 1, f"{col}_missing", dtype=object)
+            if reject_fn is not None:
+                rules[:-1] = reject_fn(pd.Series(uniques, dtype=object))
+            _add_rejects(rejects, df.index[~keep], rules[codes[~keep]])
+        df = df[keep].copy()
+        row_codes = row_codes[keep]
+    df[col] = pd.Categorical.from_codes(row_codes, categories=categories)
+    return df
+
+
+# Why _preprocess drops rows; whole shards that fail to read are listed in load_report
+REJECT_RULES = ('state_missing', 'state_numeric', 'state_invalid', 'date_unparseable')
+# Rows _preprocess keeps but flags (date only readable by format inference)
+FLAG_RULES = ('date_inferred', 'pincode_invalid')
+# Indian PIN codes are six digits with a non-zero first digit; anything else
+# (typos, junk, values that would wrap in int32) is kept as pincode 0
+PINCODE_MIN = 100000
+PINCODE_MAX = 999999
+
+
+def _add_rejects(rejects, labels, rules):
+    # labels: row labels of the dropped rows (their position in the shard), rules:
+    # one rule name per row or a single one for all
+    labels = np.asarray(labels, dtype='int64')
+    rules = np.broadcast_to(np.asarray(rules, dtype=object), labels.shape)
+    for rule in pd.unique(rules):
+        picked = labels[rules == rule]
+        rejects[rule] = np.concatenate([rejects[rule], picked]) if rule in rejects else picked
+
+
+def _concat_frames(frames):
+    # pd.concat silently turns categoricals with different categories into object
+    # columns, so align every shard to the union of categories first
+    if len(frames) > 1:
+        for col in frames[0].columns:
+            if any(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+                frames = [f.astype({col: 'category'}) for f in frames]
+                categories = pd.Index(np.concatenate([f[col].cat.categories.to_numpy(dtype=object) for f in frames])).unique().sort_values()
+                frames = [f.assign(**{col: f[col].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+# Data folder for each dataset
+DATASETS = {
+    'enrolment': "api_data_aadhar_enrolment",
+    'demographic': "api_data_aadhar_demographic",
+    'biometric': "api_data_aadhar_biometric",
+}
+
+# AadhaarBrain attribute holding each dataset's cleaned rows
+FRAME_ATTRS = {'enrolment': 'enrol_df', 'demographic': 'demo_df', 'biometric': 'bio_df'}
+
+# Declared schema per dataset: only these columns are read, and they are stored
+# compactly (categorical names, int32 pincode, narrow unsigned counts).
+# Counts start at uint16 and widen per shard if a value doesn't fit.
+_BASE_SCHEMA = {'date': 'datetime64[s]', 'state': 'category', 'district': 'category', 'pincode': 'int32'}
+SCHEMAS = {
+    'enrolment': {**_BASE_SCHEMA, 'age_0_5': 'uint16', 'age_5_17': 'uint16', 'age_18_greater': 'uint16'},
+    'demographic': {**_BASE_SCHEMA, 'demo_age_5_17': 'uint16', 'demo_age_17_': 'uint16'},
+    'biometric': {**_BASE_SCHEMA, 'bio_age_5_17': 'uint16', 'bio_age_17_': 'uint16'},
+}
+TOTAL_DTYPE = 'uint32'
+
+# Age column -> age bucket label used by the aggregate cube
+AGE_BUCKETS = {
+    'age_0_5': '0-5', 'age_5_17': '5-17', 'age_18_greater': '18+',
+    'demo_age_5_17': '5-17', 'demo_age_17_': '17+',
+    'bio_age_5_17': '5-17', 'bio_age_17_': '17+',
+}
+
+# Layout of the aggregate cube, and the date granularities it is rolled up to
+CUBE_COLUMNS = {'date': 'datetime64[s]', 'state': 'category', 'district': 'category',
+                'dataset': 'category', 'age_bucket': 'category', 'total': 'int64'}
+CUBE_FREQS = {'D': 'datetime64[D]', 'M': 'datetime64[M]', 'Y': 'datetime64[Y]'}
+
+# What read_csv can safely enforce up front. Numeric columns are coerced after
+# reading since the raw dumps contain junk values that would fail a strict dtype.
+# Dates come in as categories too: a shard has a few hundred distinct date strings.
+_READ_DTYPES = {'date': 'category', 'state': 'category', 'district': 'category'}
+
+DATE_FORMAT = '%d-%m-%Y'
+# Distinct date strings remembered across shards (cleared when it outgrows this)
+DATE_MEMO_SIZE = 100_000
+# raw date string -> (datetime64[s], parsed by inference?); NaT = unparseable.
+# Shared by every shard and dataset cleaned in this process. Process pool workers
+# are seeded with the parent's memo and hand back what they parsed (see
+# _seed_date_memo / _take_new_dates), so it carries across datasets and loads there too.
+_DATE_MEMO = {}
+# Entries parsed by this worker process since its last hand-off; None in the parent
+_DATE_NEW = None
+_NAT = np.datetime64('NaT', 's')
+
+
+def _parse_date_strings(values):
+    # Strict format first; strings that don't match are tried once more as ISO dates,
+    # then with format inference (day first, like the dumps) and remembered as inferred
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), format=DATE_FORMAT, errors='coerce')
+    results = {}
+    for value, ts in zip(values, parsed):
+        if not pd.isna(ts):
+            results[value] = (ts.to_datetime64().astype('datetime64[s]'), False)
+            continue
+        text = str(value).strip()
+        ts = pd.to_datetime(text, format='ISO8601', errors='coerce')
+        if pd.isna(ts):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                ts = pd.to_datetime(text, dayfirst=True, errors='coerce')
+        results[value] = (_NAT, False) if pd.isna(ts) else (ts.tz_localize(None).to_datetime64().astype('datetime64[s]'), True)
+    return results
+
+
+def _parse_dates(values):
+    # values: date column -> (datetime64[s] per row, mask of rows parsed by inference).
+    # Each distinct string is parsed once (and only once per process, via _DATE_MEMO);
+    # rows pick their result up through the integer codes.
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    found = {}
+    missing = []
+    for value in uniques:
+        hit = _DATE_MEMO.get(value)
+        if hit is None:
+            missing.append(value)
+        else:
+            found[value] = hit
+    if missing:
+        parsed = _parse_date_strings(missing)
+        if len(_DATE_MEMO) + len(parsed) > DATE_MEMO_SIZE:
+            _DATE_MEMO.clear()
+        _DATE_MEMO.update(parsed)
+        found.update(parsed)
+        if _DATE_NEW is not None:
+            _DATE_NEW.update(parsed)
+    # Code -1 (empty cell) points at the trailing NaT
+    lookup = np.array([found[v][0] for v in uniques] + [_NAT], dtype='datetime64[s]')
+    inferred = np.array([found[v][1] for v in uniques] + [False], dtype=bool)
+    return lookup[codes], inferred[codes]
+
+
+def _mp_context():
+    # Process pools are also started from job and warm-up threads, and forking a
+    # process with other threads running can deadlock the child on a lock one of them
+    # held. Those pools fork from a single-threaded forkserver (modeling preloaded, so
+    # workers start quickly), or spawn where there's no forkserver. A single-threaded
+    # caller (scripts, benchmarks) keeps plain fork: safe there, and unguarded scripts
+    # aren't re-run in every worker.
+    if threading.active_count() == 1 and "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["modeling"])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+def _seed_date_memo(memo):
+    # Process pool initializer: start from the parent's memo and track new entries
+    global _DATE_NEW
+    _DATE_MEMO.update(memo)
+    _DATE_NEW = {}
+
+
+def _take_new_dates():
+    # Dates a worker parsed since the last call, for the parent to remember
+    if not _DATE_NEW:
+        return {}
+    new = dict(_DATE_NEW)
+    _DATE_NEW.clear()
+    return new
+
+
+def _remember_dates(dates):
+    if len(_DATE_MEMO) + len(dates) > DATE_MEMO_SIZE:
+        _DATE_MEMO.clear()
+    _DATE_MEMO.update(dates)
+
+
+def _age_columns(dataset):
+    return [c for c in SCHEMAS[dataset] if 'age' in c]
+
+
+def _to_count(values, dtype):
+    # Coerce to a non-negative integer column, widening if the values don't fit
+    values = pd.to_numeric(values, errors='coerce').fillna(0)
+    for candidate in (dtype, 'uint32', 'uint64'):
+        info = np.iinfo(candidate)
+        if values.empty or (values.min() >= info.min and values.max() <= info.max):
+            return values.astype(candidate)
+    return values.astype('int64')
+
+
+def _empty_frame(dataset):
+    # Right columns and dtypes, zero rows: lets downstream code skip emptiness checks
+    schema = {**SCHEMAS[dataset], 'total': TOTAL_DTYPE}
+    return pd.DataFrame({c: pd.Series(dtype=t) for c, t in schema.items()})
+
+
+def _read_kwargs(dataset):
+    # Extra columns are skipped; missing ones are caught by _check_header first
+    schema = SCHEMAS[dataset]
+    return {"usecols": lambda c: c in schema,
+            "dtype": {c: t for c, t in _READ_DTYPES.items() if c in schema}}
+
+
+def _check_header(path, dataset):
+    # A shard with a wrong or renamed header would otherwise read as zero rows
+    # and vanish from the load without an error
+    columns = pd.read_csv(path, nrows=0).columns
+    missing = [c for c in SCHEMAS[dataset] if c not in columns]
+    if missing:
+        raise ValueError(f"header lacks {', '.join(missing)} (found: {', '.join(map(str, columns))})")
+
+
+def _read_shard(path, dataset=None):
+    # Runs inside a pool worker, so it has to live at module level (picklable).
+    # Never raises: failures come back as a message so one bad shard can't sink the load.
+    start = time.perf_counter()
+    try:
+        if dataset is None:
+            df = pd.read_csv(path)
+        else:
+            _check_header(path, dataset)
+            df = pd.read_csv(path, **_read_kwargs(dataset))
+        return path, df, time.perf_counter() - start, None
+    except Exception as e:
+        return path, None, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+def _clean_shard(task):
+    # Parse + clean one shard in a worker, so the regex pipeline parallelises too.
+    # The worker records its own stages (metrics_settings = Metrics(...) args) and
+    # hands them back for the parent to merge.
+    path, dataset, metrics_settings = task
+    metrics = Metrics(*metrics_settings)
+    rejects = {}
+    with metrics.stage("read_csv") as s:
+        path, df, seconds, error = _read_shard(path, dataset)
+        s.rows = 0 if df is None else len(df)
+    if error is None:
+        start = time.perf_counter()
+        try:
+            df = AadhaarBrain._preprocess(df, dataset, metrics, rejects)
+        except Exception as e:
+            df, error = None, f"{type(e).__name__}: {e}"
+        seconds += time.perf_counter() - start
+    return path, df, seconds, error, metrics.to_dict(), rejects, _take_new_dates()
+
+
+def _stream_shard(task):
+    # Streaming counterpart of _clean_shard: read in chunks, clean each chunk and fold
+    # it into the shard's aggregates, so peak memory is bounded by chunksize.
+    # Cleaned rows only come back when keep_rows is set. Chunks keep numbering rows
+    # from where the previous one stopped, so rejected rows are shard positions.
+    path, dataset, chunksize, keep_rows, metrics_settings = task
+    metrics = Metrics(*metrics_settings)
+    start = time.perf_counter()
+    agg = Aggregates()
+    parts = []
+    rejects = {}
+    try:
+        _check_header(path, dataset)
+        reader = pd.read_csv(path, chunksize=chunksize, **_read_kwargs(dataset))
+        while True:
+            with metrics.stage("read_csv") as s:
+                chunk = next(reader, None)
+                s.rows = 0 if chunk is None else len(chunk)
+            if chunk is None:
+                break
+            chunk = AadhaarBrain._preprocess(chunk, dataset, metrics, rejects)
+            with metrics.stage("aggregate", rows=len(chunk)):
+                agg.update(chunk, dataset)
+            if keep_rows:
+                parts.append(chunk)
+    except Exception as e:
+        return (path, None, None, time.perf_counter() - start, f"{type(e).__name__}: {e}", metrics.to_dict(), {},
+                _take_new_dates())
+    rows = _concat_frames(parts) if parts else None
+    return path, agg, rows, time.perf_counter() - start, None, metrics.to_dict(), rejects, _take_new_dates()
+
+
+def _shard_key(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def _sum_by_key(frames):
+    # Merge partial aggregates: same-keyed rows are added, new keys appended
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+    merged = pd.concat(frames)
+    return merged.groupby(level=list(range(merged.index.nlevels)), observed=True, sort=True).sum()
+
+
+class Moments:
+    # Count / sum / sum of squares of 'total' per key. These merge by plain addition,
+    # so mean and std can be built up chunk by chunk (or shard by shard) without the rows.
+    # Stored as int64: exact, so merging never drifts. Kept at pincode level; coarser
+    # levels (per district) are exact roll-ups of the same counters.
+    def __init__(self, keys=('state', 'district', 'pincode')):
+        self.keys = list(keys)
+        self.table = None
+
+    def update(self, df):
+        if df.empty:
+            return
+        total = df['total'].astype('int64')
+        part = pd.DataFrame({'count': 1, 'sum': total, 'sumsq': total * total})
+        part = part.groupby([df[k] for k in self.keys], observed=True).sum()
+        self.table = _sum_by_key([self.table, part])
+
+    def merge(self, other):
+        self.table = _sum_by_key([self.table, other.table])
+
+    def finalize(self, keys=None):
+        # -> DataFrame(keys..., count, sum, mean, std); std uses ddof=1 like pandas.
+        # keys: a prefix of self.keys to roll up to, e.g. ('state', 'district')
+        keys = list(keys or self.keys)
+        if self.table is None:
+            return pd.DataFrame(columns=keys + ['count', 'sum', 'mean', 'std'])
+        table = self.table
+        if keys != self.keys:
+            table = table.groupby(level=keys, observed=True, sort=True).sum()
+        t = table.astype('float64')
+        mean = t['sum'] / t['count']
+        var = (t['sumsq'] - t['sum'] * mean) / (t['count'] - 1)
+        out = pd.DataFrame({
+            'count': table['count'],
+            'sum': table['sum'],
+            'mean': mean,
+            # Clip tiny negative variances from float rounding; one row -> NaN like pandas
+            'std': np.sqrt(var.clip(lower=0)).where(t['count'] > 1),
+        })
+        return out.reset_index()
+
+
+class Aggregates:
+    # The aggregates the app reads: daily totals per (state, district, age column)
+    # and per (state, district) moments, per dataset. Everything folds from cleaned
+    # chunks and merges across shards, so a full load never has to materialize the rows.
+    def __init__(self):
+        self.days = {}      # dataset -> DataFrame indexed by (date, state, district), one column per age column
+        self.moments = {}   # dataset -> Moments over (state, district, pincode)
+
+    def update(self, df, dataset):
+        if df.empty:
+            return
+        ages = _age_columns(dataset)
+        daily = df[ages].astype('int64').groupby([df['date'], df['state'], df['district']], observed=True).sum()
+        self.days[dataset] = _sum_by_key([self.days.get(dataset), daily])
+        self.moments.setdefault(dataset, Moments()).update(df)
+
+    def merge(self, other):
+        for dataset in other.days:
+            self.days[dataset] = _sum_by_key([self.days.get(dataset), other.days[dataset]])
+            self.moments.setdefault(dataset, Moments()).merge(other.moments[dataset])
+
+    def district_moments(self, dataset):
+        return self.moments.get(dataset, Moments()).finalize(('state', 'district'))
+
+    def pincode_moments(self, dataset):
+        return self.moments.get(dataset, Moments()).finalize()
+
+    def cube(self):
+        # Long day-level cube: date, state, district, dataset, age_bucket, total
+        parts = []
+        for dataset, wide in self.days.items():
+            long = (wide.rename(columns=AGE_BUCKETS).rename_axis(columns='age_bucket')
+                    .stack().rename('total').reset_index())
+            long['dataset'] = dataset
+            parts.append(long)
+        if not parts:
+            return pd.DataFrame({c: pd.Series(dtype=t) for c, t in CUBE_COLUMNS.items()})
+        cube = _concat_frames([p.astype({'age_bucket': 'category'}) for p in parts])
+        return cube.astype(CUBE_COLUMNS)[list(CUBE_COLUMNS)]
+
+
+# Bump when the saved model layout or training setup changes
+MODEL_VERSION = 2
+ANOMALY_FEATURES = ['total_load', 'volatility', 'bio_total', 'demo_total']
+
+
+ANOMALY_MODES = ('national', 'state', 'ensemble')
+# States with fewer districts than this are scored by the national model only
+MIN_STATE_DISTRICTS = 10
+
+
+# Forest sizes (max_samples, n_estimators) tried for pincode detection, cheapest first
+PINCODE_LADDER = [(256, 50), (256, 100), (512, 100), (1024, 150), (2048, 200), (4096, 300)]
+
+
+def _forest_cost(max_samples, n_estimators, n_rows):
+    # Relative fit + score cost of a forest: trees x depth x (rows sampled + rows scored)
+    return n_estimators * np.log2(max(max_samples, 2)) * (max_samples + n_rows)
+
+
+def _fit_forest(task):
+    # Pool worker: fit one scaler + forest. key is None for the national model, else a state.
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+    key, X, n_jobs = task
+    start = time.perf_counter()
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    forest = IsolationForest(contamination=0.05, random_state=42, n_jobs=n_jobs)
+    forest.fit(X_scaled)
+    return key, scaler, forest, time.perf_counter() - start
+
+
+def _feature_fingerprint(features):
+    # Identifies the exact feature table a model was fitted on
+    cols = features[['state', 'district'] + ANOMALY_FEATURES].astype({'state': str, 'district': str})
+    digest = hashlib.sha1(pd.util.hash_pandas_object(cols, index=False).values.tobytes())
+    digest.update(f"{MODEL_VERSION}:{ANOMALY_FEATURES}".encode())
+    return digest.hexdigest()[:16]
+
+
+# Rule of Thumb (Hypothetical): 
+# 1 Kit handles 50 updates/day.
+# 1 Staff handles 40 enrolments/day.
+KIT_RATE = 50
+STAFF_RATE = 40
+DAYS_PER_MONTH = 30
+
+
+def _resource_needs(load, growth, kit_rate=KIT_RATE, staff_rate=STAFF_RATE):
+    # Works on scalars and on broadcastable arrays (districts x scenarios) alike
+    projected_load = load * (1 + growth)
+    # Monthly load -> Daily (approx / 25 working days)
+    daily_load = projected_load / DAYS_PER_MONTH
+    
+    kits_needed = np.ceil(daily_load / kit_rate)
+    staff_needed = np.ceil(daily_load / staff_rate)
+    return projected_load, kits_needed, staff_needed
+
+
+_RULES_VERSION = None
+
+
+def _rules_version():
+    # Any edit to the cleaning code or lookup tables invalidates every cached shard.
+    # Hashing the source takes ~10ms, so it's done once per process.
+    global _RULES_VERSION
+    if _RULES_VERSION is None:
+        _RULES_VERSION = _compute_rules_version()
+    return _RULES_VERSION
+
+
+def _compute_rules_version():
+    parts = [str(CACHE_FORMAT)]
+    parts += [inspect.getsource(fn) for fn in (AadhaarBrain._preprocess, _canonical_states,
+                                               _canonical_districts, _apply_canonical, _apply_districts,
+                                               _parse_dates, _parse_date_strings, _to_count)]
+    parts += [inspect.getsource(_check_header), repr(SCHEMAS), TOTAL_DTYPE, repr(_READ_DTYPES), DATE_FORMAT, repr((PINCODE_MIN, PINCODE_MAX))]
+    parts += [repr(sorted(STATE_REPLACEMENTS.items())), repr(sorted(VALID_STATES)),
+              repr(sorted(DISTRICT_MAP.items())), repr(sorted(DISTRICT_ALIASES["states"].items()))]
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:16]
+
+
+def _sql_list(paths):
+    # Python paths -> duckdb list literal
+    return "[" + ", ".join("'" + p.replace("'", "''") + "'" for p in paths) + "]"
+
+
+# Datasets the update-load views (geo lookups, features, forecasts) are built from
+UPDATE_DATASETS = ('demographic', 'biometric')
+
+# What a shared-plane generation carries besides the row frames and cubes (which
+# are memory-mapped): small attributes, pickled (see publish / attach)
+PLANE_STATE = ('aggregates', 'district_stats', 'anomaly_model', 'model_timings', 'forecast_model', 'surge_model',
+               'pincode_stats', 'pincode_report', 'load_report', 'quarantine', '_shard_state', '_load_mode')
+
+# Query results kept by QueryCache (each is a small aggregate frame)
+QUERY_CACHE_SIZE = 256
+
+
+class QueryCache:
+    # Bounded LRU of query results. The app keeps one brain for every Streamlit
+    # session, so a result computed for one session is reused by all of them.
+    # clear() is called whenever the underlying data or models change.
+    def __init__(self, maxsize=QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+    
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            generation = self._generation
+        # Computed outside the lock so slow queries don't block cached ones
+        value = compute()
+        with self._lock:
+            # Don't store a result computed from data that was replaced meanwhile
+            if generation == self._generation:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+    
+    def stats(self):
+        return {"entries": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+def _frame_property(dataset):
+    # enrol_df / demo_df / bio_df: after load_data(lazy=True) the dataset is loaded
+    # on first access
+    def get(self):
+        self._ensure_loaded(dataset)
+        return self._frames.get(dataset)
+    
+    def set(self, df):
+        self._frames[dataset] = df
+    return property(get, set)
+
 
 class AadhaarBrain:
-    def __init__(self, data_dir="/Users/rakeshmondal/Downloads/uidai data "):
+    enrol_df = _frame_property('enrolment')
+    demo_df = _frame_property('demographic')
+    bio_df = _frame_property('biometric')
+    
+    def __init__(self, data_dir=DATA_DIR, workers=None, executor="process",
+                 cache_dir=None, use_cache=True, model_dir=None, metrics=None):
         self.data_dir = data_dir
+        # Cleaned rows per dataset (behind the *_df properties); datasets still in
+        # _pending are loaded on first use. The lock serialises loads across threads,
+        # and model fits too, since they read what a load or ingest replaces.
+        self._frames = {}
+        self._pending = set()
+        self._load_lock = threading.RLock()
+        self._warmup = None
+        # Results of the query API (monthly_totals, top_anomalies, ...), see QueryCache
+        self.query_cache = QueryCache()
+        # Background fits / aggregations started by the app, shared by its sessions (see jobs.py)
+        self.jobs = jobs.JobManager()
         self.enrol_df = None
         self.demo_df = None
         self.bio_df = None
         self.district_stats = None
+        # Daily totals and per-district moments, filled by load_data
+        self.aggregates = None
+        # Pre-aggregated cube per date granularity ('D', 'M', 'Y'), see cube_query
+        self.cube = None
+        
+        # Shard ingestion: workers=None -> one per core, workers=1 -> sequential.
+        # executor is "process" (true parallel parsing) or "thread" (cheaper to spin up).
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        # Per-dataset list of {file, rows, seconds, cached, error, rejected} from the last
+        # load; rejected counts dropped rows per REJECT_RULES rule
+        self.load_report = {}
+        # dataset -> {shard file: {rule: [row numbers]}} of the rows _preprocess dropped,
+        # also written to quarantine_dir/<dataset>.json after every load
+        self.quarantine = {}
+        # dataset -> {shard path: (size, mtime_ns)} of everything loaded so far
+        self._shard_state = {}
+        self._load_mode = None
+        
+        # Cleaned shards are cached as Parquet next to the data (needs pyarrow)
+        self.cache_dir = cache_dir or os.path.join(data_dir, ".drishti_cache")
+        self.use_cache = use_cache and HAS_PARQUET
+        self.quarantine_dir = os.path.join(self.cache_dir, "quarantine")
+        # Shared data plane this brain publishes to / is attached to (see load_shared)
+        self.plane_dir = None
+        self.plane_generation = None
+        # In-process SQL engine (duckdb) and the sources its views were built from, see sql()
+        self._sql_con = None
+        self._sql_sources = None
+        self._sql_lock = threading.Lock()
+        if use_cache and not HAS_PARQUET:
+            print("pyarrow not installed, shard cache disabled.")
+        
+        # Fitted scaler + forest, persisted with the fingerprint of the features it saw
+        self.model_dir = model_dir or os.path.join(self.cache_dir, "models")
+        self.anomaly_model = None
+        # Fit/score timings of the last training run (seconds)
+        self.model_timings = {}
+        # state -> district -> {'pincodes', 'stats'}, see _build_geo_index
+        self.geo_index = {}
+        self._sorted_states = []
+        # Pincode-level features + scores and the budget/accuracy report, see detect_pincode_anomalies
+        self.pincode_stats = None
+        self.pincode_report = None
+        # Batched seasonal forecaster over monthly per-district load, see train_forecaster
+        self.forecast_model = None
+        # Online CUSUM/EWMA surge detector over daily per-district load, see detect_surges.
+        # Onsets raised by newly ingested days are appended to surge_log (JSON lines).
+        self.surge_model = None
+        self.surge_log = os.path.join(self.cache_dir, "surge_events.jsonl")
+        
+        # Stage timings / row counts / memory deltas / cProfile, off unless asked for
+        # (DRISHTI_METRICS=1, DRISHTI_METRICS_MEMORY=1, DRISHTI_PROFILE=1 or a Metrics object)
+        self.metrics = metrics or Metrics(enabled=os.environ.get("DRISHTI_METRICS") == "1",
+                                          memory=os.environ.get("DRISHTI_METRICS_MEMORY") == "1",
+                                          profile=os.environ.get("DRISHTI_PROFILE") == "1")
+        
+    def load_data(self, streaming=False, keep_rows=None, chunksize=250_000, lazy=False):
+        # streaming=True reads shards in chunks of `chunksize` rows and folds them
+        # straight into self.aggregates, so memory stays bounded by the chunk size
+        # rather than the dataset. Row frames are then only kept with keep_rows=True.
+        # lazy=True loads nothing yet: each dataset is loaded the first time something
+        # needs it (its *_df, a cube query on it, features, forecasts...), and
+        # warm_up() can load the rest in the background.
+        print("Loading data..." if not lazy else "Datasets will load on first use.")
+        if keep_rows is None:
+            keep_rows = not streaming
+        with self._load_lock:
+            # Remembered so ingest_new_shards treats new shards the same way
+            self._load_mode = {"streaming": streaming, "keep_rows": keep_rows, "chunksize": chunksize}
+            self._shard_state = {}
+            self._frames = {}
+            self.aggregates = Aggregates()
+            self._pending = set(DATASETS)
+            self.district_stats = None
+            self.query_cache.clear()
+            self._build_cube()
+            self._build_geo_index()
+            if lazy:
+                return
+            with self.metrics.profiled("load_data"):
+                self._ensure_loaded(*DATASETS)
+        
+        for name, info in self.memory_report().items():
+            print(f"  {name}: {info['rows']:,} rows, {info['bytes'] / 2**20:.1f} MB")
+
+    def _ensure_loaded(self, *datasets):
+        # Load whichever of `datasets` are still pending, then refresh what is built
+        # on top of them (cube, geo index). A saved anomaly model is restored by
+        # restore_model_async, off the caller's thread.
+        if not self._pending.intersection(datasets):
+            return
+        with self._load_lock:
+            todo = [d for d in DATASETS if d in datasets and d in self._pending]
+            if not todo:
+                return
+            for dataset in todo:
+                self._load_dataset(dataset)
+                self._pending.discard(dataset)
+            self._build_cube()
+            self._build_geo_index()
+            self.query_cache.clear()
+
+    def _load_dataset(self, dataset):
+        mode = self._load_mode
+        with self.metrics.stage(f"load.{dataset}") as s:
+            if mode["streaming"]:
+                df = self._stream_folder(dataset, mode["chunksize"], mode["keep_rows"])
+            else:
+                df = self._load_folder(dataset)
+                with self.metrics.stage("aggregate", rows=len(df)):
+                    self.aggregates.update(df, dataset)
+                if not mode["keep_rows"]:
+                    df = None
+            s.rows = sum(r["rows"] for r in self.load_report.get(dataset, []))
+        self._frames[dataset] = df
+
+    def _restore_saved_model(self):
+        # A saved model fitted on this exact data scores straight away, no training
+        self._ensure_loaded(*UPDATE_DATASETS)
+        with self._load_lock:
+            if self.district_stats is not None:
+                return
+            if self.load_model() and self.anomaly_model["fingerprint"] == _feature_fingerprint(self._district_features()):
+                self.train_anomaly_model(mode=self.anomaly_model["mode"])
+
+    def warm_up(self):
+        # Load every still-pending dataset (and the model libraries) on a background
+        # thread, and restore a saved anomaly model as a job, so pages opened later
+        # don't wait. Safe to call on every rerun.
+        self.restore_model_async()
+        if not self._pending or (self._warmup is not None and self._warmup.is_alive()):
+            return self._warmup
+        
+        def run():
+            import sklearn.ensemble  # noqa: F401
+            for dataset in DATASETS:
+                self._ensure_loaded(dataset)
+        
+        self._warmup = threading.Thread(target=run, name="drishti-warmup", daemon=True)
+        self._warmup.start()
+        return self._warmup
+
+    def loaded_datasets(self):
+        return [d for d in DATASETS if d not in self._pending]
+        
+    def ingest_new_shards(self):
+        # Pick up shards that appeared since load_data without a full reload: only the
+        # new rows are cleaned, then appended to the frames and folded into the cube
+        # and the per-district moments (count/sum/sumsq add up, nothing is regrouped).
+        # Returns {dataset: [new file names]}.
+        if self.aggregates is None:
+            self.load_data()
+            return {d: [r["file"] for r in self.load_report.get(d, [])] for d in DATASETS}
+        with self._load_lock:
+            added = self._ingest()
+        # Other processes on the shared plane pick the new generation up via refresh()
+        if added and self.plane_dir is not None:
+            self.publish()
+        return added
+
+    def _ingest(self):
+        mode = self._load_mode
+        added = {}
+        for i, dataset in enumerate(DATASETS):
+            # Pending datasets will see every shard when they load
+            if dataset in self._pending:
+                continue
+            jobs.progress(0.6 * i / len(DATASETS), f"Checking {dataset} shards")
+            seen = self._shard_state.setdefault(dataset, {})
+            files = self._list_shards(dataset)
+            new = [f for f in files if f not in seen]
+            changed = [f for f in files if f in seen and seen[f] != _shard_key(f)]
+            if changed:
+                print(f"{len(changed)} {dataset} shard(s) changed since load; call load_data() to pick up edits.")
+            if not new:
+                continue
+            
+            with self.metrics.stage(f"ingest.{dataset}"):
+                if mode["streaming"]:
+                    rows = self._stream_folder(dataset, mode["chunksize"], mode["keep_rows"], files=new)
+                else:
+                    rows = self._load_folder(dataset, files=new)
+                    with self.metrics.stage("aggregate", rows=len(rows)):
+                        self.aggregates.update(rows, dataset)
+                    if not mode["keep_rows"]:
+                        rows = None
+            current = self._frames.get(dataset)
+            if rows is not None and current is not None:
+                self._frames[dataset] = _concat_frames([current, rows])
+            added[dataset] = [os.path.basename(f) for f in new if f in seen]
+        
+        if added:
+            jobs.progress(0.6, "Refreshing the cube and models")
+            self._build_cube()
+            self._build_geo_index()
+            self.query_cache.clear()
+            # Features are read from the merged moments, so this is cheap
+            if self.district_stats is not None:
+                self.train_anomaly_model(mode=self.anomaly_model["mode"] if self.anomaly_model else 'national')
+            # The monthly series changed, so the forecaster refits (one batched solve)
+            if self.forecast_model is not None:
+                self.train_forecaster()
+            # Only the new days are stepped through the surge detector
+            if self.surge_model is not None:
+                self.detect_surges()
+        return added
+
+    def _build_geo_index(self):
+        # state -> district -> {'pincodes': sorted array, 'stats': row of district_stats}.
+        # Built from the moments' keys (a few thousand entries), never from the rows,
+        # so selectors and lookups cost the same whatever the data size.
+        with self.metrics.stage("geo_index"):
+            keys = [m.table.index.to_frame(index=False) for m in self.aggregates.moments.values()
+                    if m.table is not None]
+            index = {}
+            if keys:
+                keys = pd.concat([k.astype({'state': str, 'district': str}) for k in keys]).drop_duplicates()
+                for (state, district), pins in keys.groupby(['state', 'district'], sort=True)['pincode']:
+                    index.setdefault(state, {})[district] = {"pincodes": np.sort(pins.to_numpy()), "stats": None}
+            self.geo_index = index
+            self._sorted_states = sorted(index)
+            self._index_district_stats()
+
+    def _index_district_stats(self):
+        # Point every index entry at its district_stats row (matched on state AND district)
+        for districts in self.geo_index.values():
+            for entry in districts.values():
+                entry["stats"] = None
+        if self.district_stats is None:
+            return
+        for row in self.district_stats.to_dict('records'):
+            entry = self.geo_index.get(str(row['state']), {}).get(str(row['district']))
+            if entry is not None:
+                entry["stats"] = row
+
+    # Lookups cover every dataset loaded so far, and always the update datasets
+    def states(self):
+        self._ensure_loaded(*UPDATE_DATASETS)
+        return self._sorted_states
+
+    def districts_for(self, state):
+        # Sorted district names for a state (empty if unknown)
+        self._ensure_loaded(*UPDATE_DATASETS)
+        return list(self.geo_index.get(state, {}))
+
+    def pincodes_for(self, state, district):
+        self._ensure_loaded(*UPDATE_DATASETS)
+        entry = self.geo_index.get(state, {}).get(district)
+        return entry["pincodes"] if entry else np.array([], dtype='int32')
+
+    def district_row(self, state, district):
+        # district_stats row as a dict, or None if the district has no stats yet
+        self._ensure_loaded(*UPDATE_DATASETS)
+        entry = self.geo_index.get(state, {}).get(district)
+        return entry["stats"] if entry else None
+
+    def _build_cube(self):
+        # date (day/month/year) x state x district x dataset x age bucket -> total.
+        # Its size depends on days and districts, not on raw rows.
+        with self.metrics.stage("cube") as s:
+            day = self.aggregates.cube()
+            self.cube = {'D': day}
+            keys = ['date', 'state', 'district', 'dataset', 'age_bucket']
+            for freq in ('M', 'Y'):
+                period = day['date'].values.astype(CUBE_FREQS[freq]).astype('datetime64[s]')
+                self.cube[freq] = (day.assign(date=period)
+                                   .groupby(keys, observed=True, sort=True)['total'].sum().reset_index())
+            s.rows = len(day)
+
+    def cube_query(self, dataset=None, freq='M', state=None, district=None, age_bucket=None, by=('date',)):
+        # Totals from the cube, filtered by any of dataset/state/district/age_bucket
+        # (a value or a list of values) and grouped by the `by` columns
+        if dataset is None:
+            self._ensure_loaded(*DATASETS)
+        else:
+            self._ensure_loaded(*([dataset] if isinstance(dataset, str) else dataset))
+        cube = self.cube[freq]
+        mask = np.ones(len(cube), dtype=bool)
+        for col, value in [('dataset', dataset), ('state', state), ('district', district), ('age_bucket', age_bucket)]:
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                mask &= cube[col].isin(list(value)).to_numpy()
+            else:
+                mask &= (cube[col] == value).to_numpy()
+        return cube[mask].groupby(list(by), observed=True, sort=True)['total'].sum().reset_index()
+
+    def memory_report(self):
+        # In-memory footprint of each loaded frame (deep, so categories are counted)
+        report = {}
+        frames = [(dataset, self._frames.get(dataset)) for dataset in DATASETS]
+        frames += [('district_stats', self.district_stats)]
+        frames += [(f"cube_{freq}", cube) for freq, cube in (self.cube or {}).items()]
+        for name, df in frames:
+            if df is not None:
+                usage = df.memory_usage(deep=True, index=True)
+                report[name] = {"rows": len(df), "bytes": int(usage.sum()),
+                                "columns": {c: int(b) for c, b in usage.items()}}
+        return report
+        
+    def _list_shards(self, dataset):
+        # Sorted so row order (and anything derived from it) is stable across runs
+        return sorted(glob.glob(os.path.join(self.data_dir, DATASETS[dataset], "*.csv")))
+
+    def _load_folder(self, dataset, files=None):
+        # Returns the cleaned frame for one dataset. Shards whose (size, mtime) and
+        # cleaning rules match the cache manifest are memory-mapped from Parquet;
+        # only new or changed shards are parsed and cleaned.
+        # files: load just these shards (incremental ingest) instead of the whole folder.
+        folder_name = DATASETS[dataset]
+        incremental = files is not None
+        all_files = files if incremental else self._list_shards(dataset)
         
-    def load_data(self):
-        print("Loading data...")
-        self.enrol_df = self._load_folder("api_data_aadhar_enrolment")
-        self.demo_df = self._load_folder("api_data_aadhar_demographic")
-        self.bio_df = self._load_folder("api_data_aadhar_biometric")
-        
-        # Preprocess
-        self.enrol_df = self._preprocess(self.enrol_df, 'enrolment')
-        self.demo_df = self._preprocess(self.demo_df, 'update')
-        self.bio_df = self._preprocess(self.bio_df, 'update')
-        
-    def _load_folder(self, folder_name):
-        path = os.path.join(self.data_dir, folder_name)
-        all_files = glob.glob(os.path.join(path, "*.csv"))
-        df_list = []
+        start = time.perf_counter()
+        rules = _rules_version()
+        manifest = self._read_manifest(folder_name)
+        if manifest.get("rules") != rules:
+            manifest = {"rules": rules, "shards": {}}
+        
+        frames = {}
+        report = {}
+        quarantine = {}
+        stale = []
         for f in all_files:
-            try:
-                df_list.append(pd.read_csv(f))
-            except: pass
+            cached = self._read_cached_shard(folder_name, manifest, f)
+            if cached is None:
+                stale.append(f)
+            else:
+                # Rejected rows were recorded when the shard was cleaned
+                frames[f], quarantine[f] = cached
+                report[f] = {"file": os.path.basename(f), "rows": len(frames[f]),
+                             "seconds": 0.0, "cached": True, "error": None}
+        
+        settings = (self.metrics.enabled, self.metrics.memory)
+        tasks = [(f, dataset, settings) for f in stale]
+        for f, df, seconds, error, stages, rejects, dates in self._parallel_map(_clean_shard, tasks, share_dates=True):
+            self.metrics.merge(stages)
+            _remember_dates(dates)
+            report[f] = {
+                "file": os.path.basename(f),
+                "rows": 0 if df is None else len(df),
+                "seconds": round(seconds, 4),
+                "cached": False,
+                "error": error
+            }
+            if error:
+                print(f"Failed to load {f}: {error}")
+            else:
+                frames[f] = df
+                quarantine[f] = {rule: labels.tolist() for rule, labels in rejects.items()}
+                self._write_cached_shard(folder_name, manifest, f, df, quarantine[f])
+        
+        # Forget shards that disappeared from the data folder
+        gone = set() if incremental else set(manifest["shards"]) - {os.path.basename(f) for f in all_files}
+        for name in gone:
+            self._drop_cached_shard(folder_name, manifest, name)
+        if stale or gone:
+            self._write_manifest(folder_name, manifest)
+        
+        self._record_shards(dataset, [f for f in all_files if f in frames])
+        self._record_report(dataset, [report[f] for f in all_files], incremental, quarantine)
+        if all_files:
+            print(f"Loaded {len(frames)}/{len(all_files)} files from {folder_name} "
+                  f"({len(all_files) - len(stale)} cached) in {time.perf_counter() - start:.2f}s "
+                  f"({self._pool_size(len(stale))} workers)")
+        
+        # Concatenate once, after every shard is ready
+        df_list = [frames[f] for f in all_files if f in frames]
         if df_list:
-            return pd.concat(df_list, ignore_index=True)
-        return pd.DataFrame()
+            with self.metrics.stage("concat", rows=sum(len(d) for d in df_list)):
+                return _concat_frames(df_list)
+        return _empty_frame(dataset)
+
+    def _stream_folder(self, dataset, chunksize, keep_rows, files=None):
+        # Shards are streamed in parallel; each worker hands back its small partial
+        # aggregates (plus its rows if asked), which are merged here in file order
+        folder_name = DATASETS[dataset]
+        incremental = files is not None
+        all_files = files if incremental else self._list_shards(dataset)
+        start = time.perf_counter()
+        
+        frames = []
+        report = []
+        loaded = []
+        quarantine = {}
+        tasks = [(f, dataset, chunksize, keep_rows, (self.metrics.enabled, self.metrics.memory)) for f in all_files]
+        for f, agg, rows, seconds, error, stages, rejects, dates in self._parallel_map(_stream_shard, tasks,
+                                                                                         share_dates=True):
+            self.metrics.merge(stages)
+            _remember_dates(dates)
+            report.append({
+                "file": os.path.basename(f),
+                "rows": 0 if agg is None else int(sum(m.table['count'].sum() for m in agg.moments.values()
+                                                      if m.table is not None)),
+                "seconds": round(seconds, 4),
+                "cached": False,
+                "error": error
+            })
+            if error:
+                print(f"Failed to load {f}: {error}")
+                continue
+            with self.metrics.stage("merge_aggregates"):
+                self.aggregates.merge(agg)
+            quarantine[f] = {rule: labels.tolist() for rule, labels in rejects.items()}
+            loaded.append(f)
+            if rows is not None:
+                frames.append(rows)
+        self._record_shards(dataset, loaded)
+        self._record_report(dataset, report, incremental, quarantine)
+        
+        if all_files:
+            print(f"Streamed {len(all_files)} files from {folder_name} in {time.perf_counter() - start:.2f}s "
+                  f"({self._pool_size(len(all_files))} workers, {chunksize:,} rows/chunk)")
+        if not keep_rows:
+            return None
+        with self.metrics.stage("concat", rows=sum(len(f) for f in frames)):
+            return _concat_frames(frames) if frames else _empty_frame(dataset)
+
+    def _record_shards(self, dataset, files):
+        # Remember what has been folded in, so ingest_new_shards only picks up the rest
+        seen = self._shard_state.setdefault(dataset, {})
+        for f in files:
+            seen[f] = _shard_key(f)
+
+    def _record_report(self, dataset, report, incremental, quarantine):
+        # quarantine: {shard path: {rule: [row numbers]}} for the shards in report
+        quarantine = {os.path.basename(f): rules for f, rules in quarantine.items()}
+        for entry in report:
+            rules = quarantine.get(entry["file"], {})
+            entry["rejected"] = {rule: len(rows) for rule, rows in rules.items() if rule in REJECT_RULES}
+            entry["flagged"] = {rule: len(rows) for rule, rows in rules.items() if rule in FLAG_RULES}
+        if incremental:
+            self.load_report.setdefault(dataset, []).extend(report)
+            self.quarantine.setdefault(dataset, {}).update(quarantine)
+        else:
+            self.load_report[dataset] = report
+            self.quarantine[dataset] = quarantine
+        
+        lost = sum(n for entry in report for n in entry["rejected"].values())
+        failed = sum(1 for entry in report if entry["error"])
+        if lost or failed:
+            print(f"  {dataset}: dropped {lost:,} rows during cleaning, {failed} unreadable file(s)")
+        target = os.path.join(self.quarantine_dir, f"{dataset}.json")
+        try:
+            os.makedirs(self.quarantine_dir, exist_ok=True)
+            with open(target + ".tmp", "w") as fh:
+                json.dump({"rules": _rules_version(), "shards": self.quarantine[dataset],
+                           "unreadable": {e["file"]: e["error"] for e in self.load_report[dataset] if e["error"]}}, fh)
+            os.replace(target + ".tmp", target)
+        except OSError as e:
+            print(f"Could not write quarantine file {target}: {e}")
+
+    def rejection_report(self):
+        # One row per dataset: rows kept, rows dropped per rule, rows flagged, unreadable shards
+        rows = []
+        for dataset in DATASETS:
+            entries = self.load_report.get(dataset, [])
+            row = {"dataset": dataset, "rows_kept": sum(e["rows"] for e in entries)}
+            for rule in REJECT_RULES:
+                row[rule] = sum(e.get("rejected", {}).get(rule, 0) for e in entries)
+            row["rows_rejected"] = sum(row[rule] for rule in REJECT_RULES)
+            for rule in FLAG_RULES:
+                row[rule] = sum(e.get("flagged", {}).get(rule, 0) for e in entries)
+            row["unreadable_files"] = sum(1 for e in entries if e["error"])
+            rows.append(row)
+        return pd.DataFrame(rows)
 
-    def _preprocess(self, df, dtype):
+    # --- Shared data plane: one process loads and publishes, the others attach
+    # to the same memory-mapped frames (see dataplane.py) ---
+    def load_shared(self, plane_dir=None, **load_kwargs):
+        # Attach to the current generation; if there is none, load the data here and
+        # publish it. Processes starting meanwhile wait on the lock, then attach.
+        plane_dir = plane_dir or os.path.join(self.cache_dir, "plane")
+        if self.attach(plane_dir):
+            return
+        with dataplane.lock(plane_dir):
+            if self.attach(plane_dir):
+                return
+            self.load_data(**load_kwargs)
+            self._publish(plane_dir)
+
+    def publish(self, plane_dir=None):
+        # Write everything loaded as a new generation and swap CURRENT to it
+        plane_dir = plane_dir or self.plane_dir or os.path.join(self.cache_dir, "plane")
+        with dataplane.lock(plane_dir):
+            return self._publish(plane_dir)
+
+    def _publish(self, plane_dir):
+        self._ensure_loaded(*DATASETS)
+        with self.metrics.stage("plane.publish"):
+            frames = dict(self._frames)
+            frames.update({f"cube_{freq}": cube for freq, cube in (self.cube or {}).items()})
+            state = {name: getattr(self, name) for name in PLANE_STATE}
+            pointer = dataplane.publish(plane_dir, frames, state, meta={"rules": _rules_version()})
+        self.plane_dir = plane_dir
+        self.plane_generation = pointer["generation"]
+        print(f"Published {pointer['generation']} to {plane_dir}")
+        return pointer
+
+    def attach(self, plane_dir=None, pointer=None):
+        # Swap this brain onto a published generation without parsing anything.
+        # False when nothing is published yet or it was cleaned by other rules.
+        plane_dir = plane_dir or self.plane_dir or os.path.join(self.cache_dir, "plane")
+        pointer = pointer or dataplane.current(plane_dir)
+        if pointer is None or pointer["meta"].get("rules") != _rules_version():
+            return False
+        with self.metrics.stage("plane.attach"):
+            attached = dataplane.attach(plane_dir, pointer)
+        if attached is None:
+            return False
+        pointer, frames, state = attached
+        with self._load_lock:
+            self._frames = {dataset: frames.get(dataset) for dataset in DATASETS}
+            self.cube = {freq: frames[f"cube_{freq}"] for freq in CUBE_FREQS if f"cube_{freq}" in frames}
+            for name, value in state.items():
+                setattr(self, name, value)
+            self._pending = set()
+            self._build_geo_index()
+            self.query_cache.clear()
+            self.plane_dir = plane_dir
+            self.plane_generation = pointer["generation"]
+        print(f"Attached to {pointer['generation']} ({pointer['published_at']})")
+        return True
+
+    def refresh(self):
+        # Move to a newer generation if one was published; cheap enough for every rerun
+        if self.plane_dir is None:
+            return False
+        pointer = dataplane.current(self.plane_dir)
+        if pointer is None or pointer["generation"] == self.plane_generation:
+            return False
+        return self.attach(self.plane_dir, pointer)
+
+    # --- SQL over the shards: views `enrolment`, `demographic`, `biometric` (cleaned
+    # rows) and `raw_enrolment`, ... (the CSVs as they are, all text) ---
+    def sql(self, query, params=None):
+        # Run a query in an embedded duckdb and return the result as a DataFrame.
+        # Cleaned views read the Parquet shard cache when it is complete, so only the
+        # columns and row groups a query touches are read (in parallel), and nothing is
+        # loaded into pandas; otherwise they fall back to the loaded frames.
+        if not HAS_DUCKDB:
+            raise ImportError("AadhaarBrain.sql needs duckdb (pip install duckdb)")
+        with self._sql_lock:
+            con = self._sql_connection(query)
+            with self.metrics.stage("sql") as s:
+                result = con.execute(query, params).df() if params is not None else con.execute(query).df()
+                s.rows = len(result)
+        return result
+
+    def _sql_connection(self, query):
+        import duckdb
+        if self._sql_con is None:
+            self._sql_con = duckdb.connect()
+            self._sql_con.execute(f"SET threads = {int(self.workers)}")
+            self._sql_sources = {}
+        con = self._sql_con
+        for dataset in DATASETS:
+            raw = self._list_shards(dataset)
+            if raw and self._sql_sources.get("raw_" + dataset) != raw:
+                con.execute(f"CREATE OR REPLACE VIEW raw_{dataset} AS SELECT * FROM read_csv({_sql_list(raw)}, "
+                            "header = true, all_varchar = true, union_by_name = true)")
+                self._sql_sources["raw_" + dataset] = raw
+            # Only the cleaned views the query names are resolved (which may load a dataset);
+            # each is rebuilt when its source changed (new shards, reload, new cache files)
+            if not re.search(rf"\b{dataset}\b", query, re.IGNORECASE):
+                continue
+            source = self._sql_source(dataset)
+            key = source if source is None or isinstance(source, list) else id(source)
+            if self._sql_sources.get(dataset, ()) == key:
+                continue
+            if source is None:
+                con.execute(f"DROP VIEW IF EXISTS {dataset}")
+            elif isinstance(source, list):
+                con.execute(f"CREATE OR REPLACE VIEW {dataset} AS SELECT * FROM read_parquet({_sql_list(source)})")
+            else:
+                con.register(f"_{dataset}_frame", source)
+                con.execute(f"CREATE OR REPLACE VIEW {dataset} AS SELECT * FROM _{dataset}_frame")
+            self._sql_sources[dataset] = key
+        return con
+
+    def _sql_source(self, dataset):
+        # Parquet files of the cleaned shards if the cache holds every current shard,
+        # else the cleaned frame (loading it if needed).
+        files = self._cached_files(dataset)
+        if files is not None:
+            return files
+        # A brain nobody loaded yet (plain AadhaarBrain().sql(...)) loads on demand
+        if self._load_mode is None:
+            self.load_data(lazy=True)
+        self._ensure_loaded(dataset)
+        files = self._cached_files(dataset)
+        if files is not None:
+            return files
+        # None (no view) in streaming mode without rows or cache
+        return self._frames.get(dataset)
+
+    def _cached_files(self, dataset):
+        folder_name = DATASETS[dataset]
+        manifest = self._read_manifest(folder_name)
+        if not self.use_cache or manifest.get("rules") != _rules_version():
+            return None
+        files = []
+        for path in self._list_shards(dataset):
+            entry = manifest["shards"].get(os.path.basename(path))
+            if not entry or (entry["size"], entry["mtime_ns"]) != _shard_key(path):
+                return None
+            files.append(os.path.join(self._cache_folder(folder_name), entry["cache"]))
+        return files or None
+
+    # --- Shard cache ---
+    def _cache_folder(self, folder_name):
+        return os.path.join(self.cache_dir, folder_name)
+
+    def _read_manifest(self, folder_name):
+        if not self.use_cache:
+            return {}
+        try:
+            with open(os.path.join(self._cache_folder(folder_name), "manifest.json")) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, folder_name, manifest):
+        if not self.use_cache:
+            return
+        target = os.path.join(self._cache_folder(folder_name), "manifest.json")
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target + ".tmp", "w") as fh:
+                json.dump(manifest, fh, indent=1)
+            os.replace(target + ".tmp", target)
+        except OSError as e:
+            print(f"Could not write cache manifest {target}: {e}")
+
+    def _read_cached_shard(self, folder_name, manifest, path):
+        if not self.use_cache:
+            return None
+        # -> (cleaned frame, {rule: [row numbers]}) or None when the shard changed
+        entry = manifest["shards"].get(os.path.basename(path))
+        st = os.stat(path)
+        if not entry or entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+            return None
+        folder = self._cache_folder(folder_name)
+        try:
+            with self.metrics.stage("cache.read") as s:
+                df = pd.read_parquet(os.path.join(folder, entry["cache"]), memory_map=True)
+                # Parquet has no second-resolution timestamps; restore the schema unit
+                df = df.astype({'date': _BASE_SCHEMA['date']})
+                s.rows = len(df)
+                rejected = {}
+                if entry.get("rejects"):
+                    with open(os.path.join(folder, entry["rejects"])) as fh:
+                        rejected = json.load(fh)
+            return df, rejected
+        except Exception:
+            # Missing or corrupt cache file: treat the shard as changed
+            return None
+
+    def _write_cached_shard(self, folder_name, manifest, path, df, rejected=None):
+        # The quarantined row numbers go in a <shard>.rejects.json next to the Parquet
+        # file, keeping the manifest (read by every SQL query) small
+        if not self.use_cache:
+            return
+        name = os.path.basename(path)
+        st = os.stat(path)
+        stem = os.path.splitext(name)[0]
+        cache_name = stem + ".parquet"
+        rejects_name = stem + ".rejects.json" if rejected else None
+        folder = self._cache_folder(folder_name)
+        target = os.path.join(folder, cache_name)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            with self.metrics.stage("cache.write", rows=len(df)):
+                df.to_parquet(target + ".tmp", index=False)
+                rejects_path = os.path.join(folder, stem + ".rejects.json")
+                if rejects_name:
+                    with open(rejects_path + ".tmp", "w") as fh:
+                        json.dump(rejected, fh)
+                    os.replace(rejects_path + ".tmp", rejects_path)
+                elif os.path.exists(rejects_path):
+                    os.remove(rejects_path)
+            os.replace(target + ".tmp", target)
+        except Exception as e:
+            print(f"Could not cache {name}: {e}")
+            return
+        manifest["shards"][name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                    "cache": cache_name, "rows": len(df), "rejects": rejects_name,
+                                    "rejected": {rule: len(rows) for rule, rows in (rejected or {}).items()}}
+
+    def _drop_cached_shard(self, folder_name, manifest, name):
+        entry = manifest["shards"].pop(name)
+        for cache_name in (entry["cache"], entry.get("rejects")):
+            if cache_name:
+                try:
+                    os.remove(os.path.join(self._cache_folder(folder_name), cache_name))
+                except OSError:
+                    pass
+
+    def _pool_size(self, n_tasks):
+        return max(1, min(self.workers, n_tasks))
+
+    def _parallel_map(self, fn, items, share_dates=False):
+        # Run fn over every item (shards, per-state fits, ...) in parallel when it's
+        # worth it. Results keep input order.
+        # share_dates: seed process workers with the date memo (shard cleaning)
+        n = self._pool_size(len(items))
+        if n == 1:
+            return [fn(i) for i in items]
+        if self.executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=n)
+        elif share_dates:
+            pool = ProcessPoolExecutor(max_workers=n, mp_context=_mp_context(),
+                                       initializer=_seed_date_memo, initargs=(dict(_DATE_MEMO),))
+        else:
+            pool = ProcessPoolExecutor(max_workers=n, mp_context=_mp_context())
+        with pool:
+            return list(pool.map(fn, items))
+
+    @staticmethod
+    def _preprocess(df, dataset, metrics=NULL_METRICS, rejects=None):
+        # rejects: optional dict, filled with {rule: row labels} of every dropped row
+        # (REJECT_RULES) and every flagged one (FLAG_RULES). The labels are the
+        # reader's row numbers (0 = first data line of the shard).
+        # Shards are header-checked on read; frames handed in directly that lack a
+        # schema column still come out with the full layout
+        schema = SCHEMAS[dataset]
+        for col in schema:
+            if col not in df.columns:
+                df[col] = pd.Series(dtype=object, index=df.index)
+        
         # Convert numeric
-        for col in df.columns:
-            if 'age' in col or 'total' in col:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        if 'pincode' in df.columns:
+            with metrics.stage("preprocess.pincode", rows=len(df)):
+                pincode = pd.to_numeric(df['pincode'], errors='coerce')
+                valid = pincode.between(PINCODE_MIN, PINCODE_MAX).to_numpy()
+                if rejects is not None:
+                    invalid = ~valid & df['pincode'].notna().to_numpy()
+                    if invalid.any():
+                        _add_rejects(rejects, df.index[invalid], 'pincode_invalid')
+                # Range-checked before the downcast so out-of-range values can't wrap
+                df['pincode'] = pincode.where(valid, 0).astype(schema['pincode'])
         
-        # Date
+        # Date: parsed once per distinct string, rows without a readable date are dropped
         if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'], format='%d-%m-%Y', errors='coerce')
+            with metrics.stage("preprocess.dates", rows=len(df)):
+                dates, inferred = _parse_dates(df['date'])
+                unparsed = np.isnat(dates)
+                if rejects is not None:
+                    if unparsed.any():
+                        _add_rejects(rejects, df.index[unparsed], 'date_unparseable')
+                    if inferred.any():
+                        _add_rejects(rejects, df.index[inferred], 'date_inferred')
+                df['date'] = dates
+                if unparsed.any():
+                    df = df[~unparsed]
         
         # Clean State Names
         if 'state' in df.columns:
-            df = df.dropna(subset=['state'])
-            df['state'] = df['state'].astype(str).str.strip().str.title()
-            
-            # Remove numeric states (Junk data)
-            df = df[~df['state'].str.match(r'^\d+$')]
-            
-            # Typo Fixes
-            replacements = {
-                'West Bangal': 'West Bengal',
-                'Westbengal': 'West Bengal',
-                'West  Bengal': 'West Bengal',
-                'Chhatisgarh': 'Chhattisgarh',
-                'Uttaranchal': 'Uttarakhand',
-                'Pondicherry': 'Puducherry',
-                'Orissa': 'Odisha',
-                'Andhra Pradesh': 'Andhra Pradesh',
-                'West Bengli': 'West Bengal',
-                'Jammu And Kashmir': 'Jammu & Kashmir',
-                'Dadra And Nagar Haveli': 'Dadra & Nagar Haveli',
-                'Daman And Diu': 'Daman & Diu',
-                'Andaman And Nicobar Islands': 'Andaman & Nicobar Islands'
-            }
-            df['state'] = df['state'].replace(replacements)
-            
-            # Whitelist of valid Indian States and Union Territories (36 total)
-            VALID_STATES = {
-                # States (28)
-                'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar', 'Chhattisgarh',
-                'Goa', 'Gujarat', 'Haryana', 'Himachal Pradesh', 'Jharkhand',
-                'Karnataka', 'Kerala', 'Madhya Pradesh', 'Maharashtra', 'Manipur',
-                'Meghalaya', 'Mizoram', 'Nagaland', 'Odisha', 'Punjab',
-                'Rajasthan', 'Sikkim', 'Tamil Nadu', 'Telangana', 'Tripura',
-                'Uttar Pradesh', 'Uttarakhand', 'West Bengal',
-                
-                # Union Territories (8)
-                'Andaman & Nicobar Islands', 'Chandigarh', 
-                'Dadra & Nagar Haveli And Daman & Diu',
-                'Delhi', 'Jammu & Kashmir', 'Ladakh', 'Lakshadweep', 'Puducherry'
-            }
-            
-            # Filter out invalid states (cities, typos, etc.)
-            df = df[df['state'].isin(VALID_STATES)]
-            # Remove city names appearing as states (heuristic: if it's not in a known list, potentially drop? 
-            # Or just rely on the user ignoring them. 'Jaipur' as state is bad.
-            # Let's keep it simple for now and rely on the major fixes).
+            # Cleaning runs on the distinct values only; rows follow through their codes
+            with metrics.stage("preprocess.states", rows=len(df)):
+                df = _apply_canonical(df, 'state', _canonical_states, _state_rejections, rejects)
 
         if 'district' in df.columns:
-            df['district'] = df['district'].astype(str).str.strip().str.title()
-            
-            # Remove trailing asterisks and other special chars
-            df['district'] = df['district'].str.replace(r'\s*\*+\s*$', '', regex=True)
-            
-            # Remove parenthetical notes like (Bh), (Kar), (Mh), (R), (M), (Urban), etc.
-            df['district'] = df['district'].str.replace(r'\s*\([^)]*\)', '', regex=True)
-            
-            # Clean up extra spaces
-            df['district'] = df['district'].str.replace(r'\s+', ' ', regex=True).str.strip()
-            
-            # 1. Manual Mappings (Factual/Official/Phonetic Name Changes)
-            manual_map = {
-                # West Bengal (Phonetic fixes)
-                'Haora': 'Howrah', 'Hugli': 'Hooghly', 'Midnapore': 'Paschim Medinipur', 
-                'North 24 Paraganas': 'North 24 Parganas', 'South 24 Paraganas': 'South 24 Parganas',
-                'North 24 Pgns': 'North 24 Parganas', 'South 24 Pgns': 'South 24 Parganas',
-                'Parganas North': 'North 24 Parganas', 'Parganas South': 'South 24 Parganas',
-                'Calcutta': 'Kolkata', 'South Dumdum': 'South Dum Dum',
-                
-                # Maharashtra (Official Changes & Typos)
-                'Ahmednagar': 'Ahilyanagar', 'Aurangabad': 'Chhatrapati Sambhaji Nagar',
-                'Osmanabad': 'Dharashiv', 'Beed': 'Bid', 'Bombay': 'Mumbai', 'Poona': 'Pune',
-                'Mumbai Sub Urban': 'Mumbai Suburban', 'Raigarh': 'Raigad',
-                
-                # Kerala (Anglicized vs Local)
-                'Trivandrum': 'Thiruvananthapuram', 'Quilon': 'Kollam', 'Alleppey': 'Alappuzha',
-                'Trichur': 'Thrissur', 'Palghat': 'Palakkad', 'Calicut': 'Kozhikode', 
-                'Cannanore': 'Kannur', 'Cochin': 'Kochi',
-                
-                # Karnataka (Previously added + refinements)
-                'Bangalore': 'Bengaluru', 'Bangalore Rural': 'Bengaluru Rural', 'Bangalore South': 'Bengaluru South',
-                'Belgaum': 'Belagavi', 'Bellary': 'Ballari', 'Mysore': 'Mysuru', 'Gulbarga': 'Kalaburagi',
-                'Shimoga': 'Shivamogga', 'Tumkur': 'Tumakuru', 'Bijapur': 'Vijayapura', 'Chikmagalur': 'Chikkamagaluru',
-                'Chickmagalur': 'Chikkamagaluru', 'Chamrajanagar': 'Chamarajanagar', 'Chamrajnagar': 'Chamarajanagar',
-                'Hasan': 'Hassan', 'Davangere': 'Davanagere',
-                
-                # Uttar Pradesh (Refined)
-                'Allahabad': 'Prayagraj', 'Bara Banki': 'Barabanki', 'Rae Bareli': 'Raebareli',
-                'Budaun': 'Badaun', 'Sant Ravidas Nagar': 'Bhadohi', 'Kheri': 'Lakhimpur Kheri',
-                'Firozpur': 'Ferozepur',
-                
-                # Andhra Pradesh / Telangana (Refined)
-                'Vizag': 'Visakhapatnam', 'Vizianagaram': 'Vijayanagaram', 'Karim Nagar': 'Karimnagar',
-                'K.V.Rangareddy': 'K.V. Rangareddy', 'Mahabub Nagar': 'Mahabubnagar',
-                'Mahbubnagar': 'Mahabubnagar', 'Ananthapur': 'Anantapur', 'Ananthapuramu': 'Anantapur',
-                'Cuddapah': 'Y. S. R', 'Kadapa': 'Y. S. R',
-                
-                # Others
-                'Andamans': 'Andaman', 'Nicobars': 'Nicobar', 'Leh Ladakh': 'Leh',
-                'Janjgir - Champa': 'Janjgir-Champa', 'Janjgir Champa': 'Janjgir-Champa',
-                'Banas Kantha': 'Banaskantha', 'Panch Mahals': 'Panchmahals', 'Sabar Kantha': 'Sabarkantha',
-                'Surendra Nagar': 'Surendranagar', 'Ahmadabad': 'Ahmedabad', 'Dohad': 'Dahod',
-                'Yamuna Nagar': 'Yamunanagar', 'S.A.S Nagar': 'Sahibzada Ajit Singh Nagar',
-                'Sas Nagar': 'Sahibzada Ajit Singh Nagar', 'Kaimur': 'Kaimur'
-            }
-            df['district'] = df['district'].replace(manual_map)
+            with metrics.stage("preprocess.districts", rows=len(df)):
+                df = _apply_districts(df)
 
-            # 2. String Cleaning (Fast)
-            df['district'] = df['district'].str.replace(r'\s*\*+\s*$', '', regex=True)
-            df['district'] = df['district'].str.replace(r'\s*\([^)]*\)', '', regex=True)
-            df['district'] = df['district'].str.replace(r'\s+', ' ', regex=True).str.strip().str.title()
-
-            # The fuzzy logic is too slow for millions of rows. 
-            # We use the expanded manual_map for performance.
-            # (Fuzzy logic could be run once to generate this map, but not every load)
-            
-            # Additional discovered variations from previous fuzzy runs
-            extra_maps = {
-                'Dohad': 'Dahod', 'Ahmadabad': 'Ahmedabad', 'Surendra Nagar': 'Surendranagar',
-                'Banaskantha': 'Banas Kantha', 'Sabarkantha': 'Sabar Kantha',
-                'Hooghly': 'Hooghly', 'Howrah': 'Howrah', # Ensure canonical
-            }
-            manual_map.update(extra_maps)
-            df['district'] = df['district'].replace(manual_map)
-        
-        # Date Parsing (Robust)
-        if 'date' in df.columns:
-            # First try the standard format (fastest)
-            df['date'] = pd.to_datetime(df['date'], format='%d-%m-%Y', errors='coerce')
-            # If everything is NaT, try inferring
-            if df['date'].isna().all() and not df.empty:
-                df['date'] = pd.to_datetime(df['date'], errors='coerce')
-            
-            # Final fallback: strip and try again if still some NaT
-            df = df.dropna(subset=['date'])
 
         # Calculate Total Column Safely
-        cols_to_sum = []
-        if dtype == 'enrolment':
-            target_cols = ['age_0_5', 'age_5_17', 'age_18_greater']
-        else: # update
-            target_cols = [c for c in df.columns if 'age' in c]
-        
-        # Only sum columns that actually exist in the dataframe
-        for c in target_cols:
-            if c in df.columns:
-                df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-                cols_to_sum.append(c)
-        
-        if cols_to_sum:
-            df['total'] = df[cols_to_sum].sum(axis=1)
-        else:
-            df['total'] = 0
+        with metrics.stage("preprocess.counts", rows=len(df)):
+            cols_to_sum = _age_columns(dataset)
+            for c in cols_to_sum:
+                df[c] = _to_count(df[c], schema[c])
+            
+            # Summed in int64 so narrow age columns can't overflow
+            df['total'] = _to_count(df[cols_to_sum].astype('int64').sum(axis=1), TOTAL_DTYPE)
             
-        return df
+        return df[list(schema) + ['total']]
 
-    def train_anomaly_model(self):
-        print("Training Anomaly Model...")
+    def _district_features(self):
         # Aggregating by District
+        return self._build_features(self.aggregates.district_moments, ['state', 'district'])
+
+    def _pincode_features(self):
+        # Same features one level down; pincodes are keyed with their district since
+        # a few pincodes straddle district boundaries. Pincode 0 (missing or invalid)
+        # is not a place, so it isn't scored.
+        features = self._build_features(self.aggregates.pincode_moments, ['state', 'district', 'pincode'])
+        return features[features['pincode'] != 0].reset_index(drop=True)
+
+    def _build_features(self, moments, keys):
         # Features: Total Volume, Variance (Std Dev over time)
         
         # We will use Updates (Demo + Bio) for anomalies as that's the stress point
         # Combine demo and bio for total update load
-        d_grp = self.demo_df.groupby(['state', 'district'])['total'].agg(['sum', 'mean', 'std']).reset_index()
-        d_grp.columns = ['state', 'district', 'demo_total', 'demo_mean', 'demo_std']
+        # Sum / mean / std come from the mergeable moments built at load time,
+        # so this works in streaming mode too and never regroups the rows
+        self._ensure_loaded(*UPDATE_DATASETS)
+        with self.metrics.stage("features." + keys[-1]) as s:
+            d_grp = moments('demographic')[keys + ['sum', 'mean', 'std']]
+            d_grp.columns = keys + ['demo_total', 'demo_mean', 'demo_std']
         
-        b_grp = self.bio_df.groupby(['state', 'district'])['total'].agg(['sum', 'mean', 'std']).reset_index()
-        b_grp.columns = ['state', 'district', 'bio_total', 'bio_mean', 'bio_std']
+            b_grp = moments('biometric')[keys + ['sum', 'mean', 'std']]
+            b_grp.columns = keys + ['bio_total', 'bio_mean', 'bio_std']
         
-        # Merge
-        features = pd.merge(d_grp, b_grp, on=['state', 'district'], how='outer').fillna(0)
+            # Merge
+            features = pd.merge(d_grp, b_grp, on=keys, how='outer').fillna(0)
         
-        features['total_load'] = features['demo_total'] + features['bio_total']
-        features['volatility'] = features['demo_std'] + features['bio_std']
+            features['total_load'] = features['demo_total'] + features['bio_total']
+            features['volatility'] = features['demo_std'] + features['bio_std']
+            s.rows = len(features)
+        return features
+
+    def train_anomaly_model(self, force=False, mode='national'):
+        # mode: 'national' = one forest over every district (big metros dominate),
+        # 'state' = one forest per state so small districts are judged against their
+        # neighbours, 'ensemble' = average of the national and per-state scores.
+        # Reuses the saved model when it was fitted on exactly this feature table in
+        # the same mode; refits (and saves) only when forced or the data changed.
+        if mode not in ANOMALY_MODES:
+            raise ValueError(f"mode must be one of {ANOMALY_MODES}, got {mode!r}")
+        with self._load_lock:
+            return self._train_anomaly_model(force, mode)
+
+    def _train_anomaly_model(self, force, mode):
+        jobs.progress(0.05, "Building district features")
+        features = self._district_features()
+        fingerprint = _feature_fingerprint(features)
         
-        # Prepare for ML
-        X = features[['total_load', 'volatility', 'bio_total', 'demo_total']]
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
+        if self.anomaly_model is None:
+            self.load_model()
+        model = self.anomaly_model
+        if force or model is None or model["fingerprint"] != fingerprint or model["mode"] != mode:
+            print(f"Training Anomaly Model ({mode})...")
+            jobs.progress(0.1, f"Fitting {mode} model")
+            with self.metrics.profiled("train_anomaly_model"), \
+                    self.metrics.stage(f"anomaly.fit.{mode}", rows=len(features)):
+                self.anomaly_model = self._fit_anomaly_model(features, mode)
+            self.anomaly_model["fingerprint"] = fingerprint
+            self.save_model()
         
-        # Model
-        iso_forest = IsolationForest(contamination=0.05, random_state=42)
-        features['anomaly'] = iso_forest.fit_predict(X_scaled)
-        features['anomaly_score'] = iso_forest.decision_function(X_scaled)
+        jobs.progress(0.9, "Scoring districts")
+        start = time.perf_counter()
+        with self.metrics.stage("anomaly.score", rows=len(features)):
+            features = self.score(features)
+        self.model_timings["score"] = round(time.perf_counter() - start, 4)
         
         # -1 is anomaly, 1 is normal
         anomalies = features[features['anomaly'] == -1].copy()
         anomalies['risk_score'] = abs(anomalies['anomaly_score']) # Higher absolute val = more anomalous
         
         self.district_stats = features
+        self._index_district_stats()
+        self.query_cache.clear()
         print(f"Detected {len(anomalies)} anomalies.")
         return anomalies.sort_values('risk_score', ascending=False)
 
-    def get_district_stats(self, district_name):
+    def _fit_anomaly_model(self, features, mode):
+        # The national forest is always fitted (it also covers small states); its
+        # trees are built on threads. Per-state forests are fitted side by side on
+        # the worker pool, single-threaded each to avoid oversubscription.
+        timings = {}
+        start = time.perf_counter()
+        X = features[ANOMALY_FEATURES]
+        _, scaler, forest, timings["national_fit"] = _fit_forest((None, X, self.workers))
+        
+        state_models = {}
+        if mode != 'national':
+            counts = features['state'].value_counts()
+            states = sorted(counts[counts >= MIN_STATE_DISTRICTS].index)
+            tasks = [(s, X[(features['state'] == s).to_numpy()], 1) for s in states]
+            jobs.progress(0.3, f"Fitting {len(tasks)} per-state models")
+            state_start = time.perf_counter()
+            per_state = {}
+            for state, s_scaler, s_forest, seconds in self._parallel_map(_fit_forest, tasks):
+                state_models[state] = (s_scaler, s_forest)
+                per_state[state] = round(seconds, 4)
+            timings["state_fit_wall"] = round(time.perf_counter() - state_start, 4)
+            timings["state_fit_cpu"] = round(sum(per_state.values()), 4)
+            timings["per_state"] = per_state
+        timings["national_fit"] = round(timings["national_fit"], 4)
+        timings["total_fit"] = round(time.perf_counter() - start, 4)
+        self.model_timings = timings
+        print(f"Fitted {1 + len(state_models)} model(s) in {timings['total_fit']:.2f}s "
+              f"({self._pool_size(len(state_models))} workers)")
+        
+        return {
+            "version": MODEL_VERSION,
+            "mode": mode,
+            "trained_at": pd.Timestamp.now().isoformat(timespec='seconds'),
+            "n_districts": len(features),
+            "scaler": scaler,
+            "forest": forest,
+            "state_models": state_models,
+            "timings": timings,
+        }
+
+    def score(self, features=None):
+        # Apply the fitted model to a feature table (default: current district
+        # features) without refitting. Adds 'anomaly' (-1/1) and 'anomaly_score'
+        # (negative = anomalous); per-state/ensemble modes also add the national
+        # and state scores they were built from.
+        model = self.anomaly_model
+        if model is None:
+            raise ValueError("No anomaly model: call train_anomaly_model() or load_model() first.")
+        if features is None:
+            features = self._district_features()
+        features = features.copy()
+        X = features[ANOMALY_FEATURES]
+        national = model["forest"].decision_function(model["scaler"].transform(X))
+        
+        if model["mode"] == 'national':
+            final = national
+        else:
+            # Districts of states without their own forest keep the national score
+            state_score = national.copy()
+            states = features['state'].to_numpy()
+            for state, (scaler, forest) in model["state_models"].items():
+                mask = states == state
+                if mask.any():
+                    state_score[mask] = forest.decision_function(scaler.transform(X[mask]))
+            features['national_score'] = national
+            features['state_score'] = state_score
+            final = state_score if model["mode"] == 'state' else (national + state_score) / 2
+        
+        features['anomaly'] = np.where(final < 0, -1, 1)
+        features['anomaly_score'] = final
+        return features
+
+    def detect_pincode_anomalies(self, time_budget=10.0, contamination=0.05):
+        # Pincode-level hotspots (~19k pincodes vs ~900 districts), which district
+        # totals hide. Forests of growing size (PINCODE_LADDER) are fitted until the
+        # next one would overrun time_budget seconds; the largest that fitted is used.
+        # Every smaller forest is compared against it, so pincode_report shows what a
+        # tighter budget would cost in agreement.
+        with self._load_lock, self.metrics.profiled("detect_pincode_anomalies"), \
+                self.metrics.stage("pincode_scan") as s:
+            anomalies = self._scan_pincodes(time_budget, contamination)
+            s.rows = 0 if self.pincode_stats is None else len(self.pincode_stats)
+        return anomalies
+
+    def _scan_pincodes(self, time_budget, contamination):
+        features = self._pincode_features()
+        n = len(features)
+        if n < 2:
+            self.pincode_stats, self.pincode_report = features, {}
+            return features.iloc[0:0]
+        from sklearn.ensemble import IsolationForest
+        from sklearn.preprocessing import StandardScaler
+        X = StandardScaler().fit_transform(features[ANOMALY_FEATURES])
+        
+        start = time.perf_counter()
+        runs = []
+        for max_samples, n_estimators in PINCODE_LADDER:
+            max_samples = min(max_samples, n)
+            if runs:
+                prev = runs[-1]
+                if (max_samples, n_estimators) == (prev["max_samples"], prev["n_estimators"]):
+                    continue
+                estimate = prev["seconds"] * (_forest_cost(max_samples, n_estimators, n)
+                                              / _forest_cost(prev["max_samples"], prev["n_estimators"], n))
+                if time.perf_counter() - start + estimate > time_budget:
+                    break
+            jobs.progress(min(0.95, (time.perf_counter() - start) / time_budget),
+                          f"Fitting forest {len(runs) + 1} ({n_estimators} trees x {max_samples} samples)")
+            fit_start = time.perf_counter()
+            forest = IsolationForest(n_estimators=n_estimators, max_samples=max_samples,
+                                     contamination=contamination, random_state=42, n_jobs=self.workers)
+            forest.fit(X)
+            scores = forest.decision_function(X)
+            runs.append({"max_samples": max_samples, "n_estimators": n_estimators,
+                         "seconds": time.perf_counter() - fit_start, "scores": scores})
+        
+        # Agreement of each run with the chosen (largest) one
+        best = runs[-1]["scores"]
+        best_flags = best < 0
+        best_rank = pd.Series(best).rank()
+        for run in runs:
+            flags = run["scores"] < 0
+            union = (flags | best_flags).sum()
+            run["flag_jaccard"] = float((flags & best_flags).sum() / union) if union else 1.0
+            run["rank_corr"] = float(pd.Series(run["scores"]).rank().corr(best_rank))
+        
+        features['anomaly'] = np.where(best_flags, -1, 1)
+        features['anomaly_score'] = best
+        self.pincode_stats = features
+        self.pincode_report = {
+            "runs": pd.DataFrame([{k: v for k, v in r.items() if k != "scores"} for r in runs]).round(4),
+            "chosen": {k: runs[-1][k] for k in ("max_samples", "n_estimators")},
+            "seconds": round(time.perf_counter() - start, 4),
+            "n_pincodes": n,
+        }
+        print(f"Scanned {n:,} pincodes in {self.pincode_report['seconds']:.2f}s "
+              f"(max_samples={runs[-1]['max_samples']}, n_estimators={runs[-1]['n_estimators']}).")
+        
+        anomalies = features[features['anomaly'] == -1].copy()
+        anomalies['risk_score'] = abs(anomalies['anomaly_score'])
+        return anomalies.sort_values('risk_score', ascending=False)
+
+    def _model_path(self):
+        return os.path.join(self.model_dir, "anomaly_model.joblib")
+
+    def save_model(self):
+        self._dump_model(self.anomaly_model, self._model_path(), "anomaly model")
+
+    def _dump_model(self, model, path, what):
+        import joblib
+        try:
+            os.makedirs(self.model_dir, exist_ok=True)
+            joblib.dump(model, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Could not save {what} to {path}: {e}")
+
+    def load_model(self):
+        # Returns True if a compatible saved model was loaded
+        import joblib
+        try:
+            model = joblib.load(self._model_path())
+        except Exception:
+            return False
+        if model.get("version") != MODEL_VERSION:
+            return False
+        self.anomaly_model = model
+        return True
+
+    # --- Background jobs: the app starts fits with these instead of blocking its
+    # script run, then polls the returned Job (see jobs.py). An identical request
+    # while one is queued or running gets that job back. ---
+    def train_anomaly_model_async(self, force=False, mode='national'):
+        return self.jobs.submit(("anomaly_model", mode, force), self.train_anomaly_model, force=force, mode=mode)
+
+    def detect_pincode_anomalies_async(self, time_budget=10.0, contamination=0.05):
+        return self.jobs.submit(("pincode_scan", time_budget, contamination), self.detect_pincode_anomalies,
+                                time_budget=time_budget, contamination=contamination)
+
+    def restore_model_async(self):
+        # Scores the saved anomaly model (joblib + sklearn) once per brain, if it was
+        # fitted on this data; None when there is nothing left to restore
+        if self.district_stats is not None:
+            return None
+        job = self.jobs.get(("restore_model",))
+        if job is not None and job.done():
+            return job if job.status == jobs.FAILED else None
+        return self.jobs.submit(("restore_model",), self._restore_saved_model)
+
+    def ingest_new_shards_async(self):
+        return self.jobs.submit(("ingest",), self.ingest_new_shards)
+
+    def detect_surges_async(self):
+        return self.jobs.submit(("surges",), self.detect_surges)
+
+    def prepare_allocator_async(self):
+        # District scores plus the forecast-driven resource plan the allocator page reads
+        return self.jobs.submit(("allocator",), self._prepare_allocator)
+
+    def _prepare_allocator(self):
+        # Checked under the lock: a fit already running (any mode) is waited for, not redone
+        with self._load_lock:
+            if self.district_stats is None:
+                self.train_anomaly_model()
+        jobs.progress(0.5, "Forecasting district demand")
+        return self.resource_plan()
+
+    # --- Query API: what the app pages read. Results are small aggregates, cached
+    # in query_cache and handed out as copies so callers can't alter the cache. ---
+    def _cached(self, key, compute):
+        value = self.query_cache.get(key, compute)
+        return value.copy() if isinstance(value, (pd.DataFrame, list, dict)) else value
+
+    def monthly_totals(self, dataset, state=None, district=None):
+        # date (month start), total for one dataset or a list of them, optionally
+        # narrowed to a state / district
+        key = ("monthly_totals", dataset if isinstance(dataset, str) else tuple(dataset), state, district)
+        return self._cached(key, lambda: self.cube_query(dataset, freq='M', state=state, district=district))
+
+    def yearly_enrolment(self):
+        # year, date (year start), total enrolments
+        def compute():
+            yearly = self.cube_query('enrolment', freq='Y')
+            yearly.insert(0, 'year', yearly['date'].dt.year)
+            return yearly
+        return self._cached(("yearly_enrolment",), compute)
+
+    def top_anomalies(self, k=10):
+        # The k riskiest anomalous districts (all of them for k=None) from the last
+        # scoring run, training the national model first if nothing is scored yet
+        def compute():
+            if self.district_stats is None:
+                self.train_anomaly_model()
+            anomalies = self.district_stats[self.district_stats['anomaly'] == -1].copy()
+            anomalies['risk_score'] = anomalies['anomaly_score'].abs()
+            anomalies = anomalies.sort_values('risk_score', ascending=False).reset_index(drop=True)
+            return anomalies if k is None else anomalies.head(k)
+        return self._cached(("top_anomalies", k), compute)
+
+    def resource_plan(self):
+        # forecast_resources() for every district
+        return self._cached(("resource_plan",), self.forecast_resources)
+
+    def district_plan(self, state, district):
+        # One district's row of resource_plan() as a dict, or None
+        def compute():
+            plan = self.resource_plan()
+            row = plan[(plan['state'] == state) & (plan['district'] == district)]
+            return row.iloc[0].to_dict() if len(row) else None
+        return self._cached(("district_plan", state, district), compute)
+
+    def get_district_stats(self, district_name, state=None):
+        # With a state this is an index lookup; the name alone can match same-named
+        # districts in several states, so every match is returned
         if self.district_stats is None:
             return None
-        return self.district_stats[self.district_stats['district'] == district_name]
+        if state is not None:
+            row = self.district_row(state, district_name)
+            return pd.DataFrame([row] if row else [], columns=self.district_stats.columns)
+        rows = [d[district_name]["stats"] for d in self.geo_index.values()
+                if district_name in d and d[district_name]["stats"] is not None]
+        return pd.DataFrame(rows, columns=self.district_stats.columns)
 
-    def recommend_resources(self, district, current_load, projected_growth_pct=0.2):
-        # Rule of Thumb (Hypothetical): 
-        # 1 Kit handles 50 updates/day.
-        # 1 Staff handles 40 enrolments/day.
-        
-        projected_load = current_load * (1 + projected_growth_pct)
-        # Monthly load -> Daily (approx / 25 working days)
-        daily_load = projected_load / 30 
+    def train_forecaster(self, force=False):
+        # Seasonal model of monthly demographic + biometric load for every district,
+        # fitted in one batched solve (see forecasting.py). Reused from memory or
+        # disk while the monthly series is unchanged.
+        import joblib
+        with self._load_lock:
+            self._ensure_loaded(*forecasting.FORECAST_DATASETS)
+            start, keys, Y = forecasting.monthly_series(self.cube['M'])
+            if start is None:
+                raise ValueError("No demographic/biometric data to forecast.")
+            fingerprint = forecasting.fingerprint(start, keys, Y)
         
-        kits_needed = np.ceil(daily_load / 50)
-        staff_needed = np.ceil(daily_load / 40)
+            model = self.forecast_model
+            if model is None or model["fingerprint"] != fingerprint:
+                try:
+                    model = joblib.load(self._forecast_path())
+                except Exception:
+                    model = None
+            if force or model is None or model.get("version") != forecasting.FORECAST_VERSION \
+                    or model["fingerprint"] != fingerprint:
+                jobs.progress(0.5, f"Fitting demand forecaster for {Y.shape[1]} districts")
+                with self.metrics.stage("forecast.fit", rows=Y.shape[1]):
+                    model = forecasting.fit(start, keys, Y)
+                model["fingerprint"] = fingerprint
+                print(f"Fitted forecaster for {Y.shape[1]} districts over {Y.shape[0]} months "
+                      f"in {model['fit_seconds']:.3f}s")
+                self._dump_model(model, self._forecast_path(), "forecaster")
+                self.query_cache.clear()
+            self.forecast_model = model
+        return model
+
+    def detect_surges(self):
+        # Bring the surge detector up to date with the daily cube; returns the onset
+        # events raised by days it hadn't processed yet. The first call builds it from
+        # the whole history (nothing is emitted then); later calls, e.g. from
+        # ingest_new_shards, step only the new days and append their onsets to surge_log.
+        with self._load_lock:
+            self._ensure_loaded(*surge.SURGE_DATASETS)
+            first = self.surge_model is None
+            with self.metrics.stage("surge.update") as s:
+                self.surge_model, events = surge.update(self.surge_model, self.cube['D'])
+                s.rows = self.surge_model["update_days"]
+        if first:
+            print(f"Surge detector built over {len(self.surge_model['digests'])} days x "
+                  f"{len(self.surge_model['keys'])} districts: "
+                  f"{len(self.surge_model['events'])} onsets on record.")
+            return []
+        for e in events:
+            print(f"Surge onset: {e['district']} ({e['state']}) since {e['onset']:%d %b %Y}, "
+                  f"{e['load']:,.0f} vs baseline {e['baseline']:,.0f} (x{e['ratio']:.1f})")
+        if events:
+            try:
+                os.makedirs(os.path.dirname(self.surge_log), exist_ok=True)
+                with open(self.surge_log, "a") as fh:
+                    for e in events:
+                        fh.write(json.dumps(dict(e, onset=e["onset"].isoformat(),
+                                                 detected=e["detected"].isoformat())) + "\n")
+            except OSError as err:
+                print(f"Could not write surge log {self.surge_log}: {err}")
+        return events
+
+    def surge_events(self, since=None):
+        # Every onset on record (newest first), optionally only those detected on or after `since`
+        if self.surge_model is None:
+            self.detect_surges()
+        events = surge.events_frame(self.surge_model)
+        if since is not None:
+            events = events[events['detected'] >= pd.Timestamp(since)].reset_index(drop=True)
+        return events
+
+    def active_surges(self):
+        # Districts whose latest surge hasn't subsided yet
+        if self.surge_model is None:
+            self.detect_surges()
+        return surge.active_frame(self.surge_model)
+
+    def _forecast_path(self):
+        return os.path.join(self.model_dir, "forecast_model.joblib")
+
+    def forecast_demand(self, horizon=forecasting.FORECAST_HORIZON, state=None, district=None):
+        # Monthly load forecast (and upper band) for the next `horizon` months,
+        # for every district or just the given state / district
+        frame = self._cached(("forecast_demand", horizon),
+                             lambda: forecasting.forecast_frame(self.train_forecaster(), horizon))
+        if state is not None:
+            frame = frame[frame['state'] == state]
+        if district is not None:
+            frame = frame[frame['district'] == district]
+        return frame.reset_index(drop=True)
+
+    def forecast_resources(self, horizon=forecasting.FORECAST_HORIZON, kit_rate=KIT_RATE, staff_rate=STAFF_RATE):
+        # Kits and staff per district sized for the busiest forecast month, so the
+        # July surge is covered instead of the average month. Loads are per month.
+        model = self.train_forecaster()
+        months, point, upper = forecasting.predict(model, horizon)
+        peak = point.argmax(axis=0)
+        cols = np.arange(point.shape[1])
+        table = model["keys"].copy()
+        table['mean_monthly_load'] = model["mean_load"]
+        table['last_monthly_load'] = model["last_load"]
+        table['forecast_monthly_load'] = point.mean(axis=0)
+        table['peak_load'] = point[peak, cols]
+        table['peak_upper'] = upper[peak, cols]
+        table['peak_month'] = months[peak].astype('datetime64[s]')
+        _, kits, staff = _resource_needs(table['peak_load'].to_numpy(), 0.0, kit_rate, staff_rate)
+        table['kits_required'] = kits.astype('int64')
+        table['staff_required'] = staff.astype('int64')
+        return table
+
+    def recommend_resources(self, district, current_load, projected_growth_pct=0.2):
+        # current_load is a monthly load (e.g. a forecast_resources peak_load)
+        projected_load, kits_needed, staff_needed = _resource_needs(current_load, projected_growth_pct)
         
         return {
             "projected_monthly_load": int(projected_load),
@@ -263,6 +2000,29 @@ class AadhaarBrain:
             "staff_required": int(staff_needed)
         }
 
+    def plan_resources(self, district_stats=None, growth_rates=(0.0, 0.2, 0.5),
+                       kit_rate=KIT_RATE, staff_rate=STAFF_RATE, load_col='peak_load'):
+        # Nationwide what-if: every district x every growth scenario in one numpy pass.
+        # district_stats defaults to forecast_resources(), so growth is headroom over
+        # each district's forecast peak month; load_col must hold a monthly load.
+        # kit_rate / staff_rate: updates per kit / per staff per day, either a scalar,
+        # an array aligned with the districts, or the name of a column in district_stats.
+        # Returns a frame indexed by (state, district) with columns (metric, growth).
+        stats = self.forecast_resources() if district_stats is None else district_stats
+        growth = np.asarray(growth_rates, dtype='float64')
+        
+        def per_district(rate):
+            rate = stats[rate] if isinstance(rate, str) else rate
+            return np.broadcast_to(np.asarray(rate, dtype='float64'), (len(stats),))[:, None]
+        
+        projected, kits, staff = _resource_needs(stats[load_col].to_numpy(dtype='float64')[:, None], growth[None, :],
+                                                 per_district(kit_rate), per_district(staff_rate))
+        columns = pd.MultiIndex.from_product([["projected_load", "kits_required", "staff_required"], growth.round(4)],
+                                             names=["metric", "growth"])
+        plan = pd.DataFrame(np.hstack([np.floor(projected), kits, staff]).astype('int64'), columns=columns,
+                            index=pd.MultiIndex.from_frame(stats[['state', 'district']].astype(str)))
+        return plan
+
 if __name__ == "__main__":
     brain = AadhaarBrain()
     brain.load_data()
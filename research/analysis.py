@@ -1,60 +1,38 @@
-import pandas as pd
-import os
-import glob
-
-DATA_DIR = "/Users/rakeshmondal/Downloads/uidai data "
-
-def load_data(folder_name):
-    # Depending on how the unzip worked, the folder might not have the trailing space
-    # The folders created were just "api_data_aadhar_enrolment" etc. inside the cwd.
-    # CWD is DATA_DIR.
-    path = os.path.join(DATA_DIR, folder_name)
-    all_files = glob.glob(os.path.join(path, "*.csv"))
-    
-    if not all_files:
-        print(f"No files found in {path}")
-        return None
-        
-    print(f"Loading {len(all_files)} files from {folder_name}...")
-    df_list = []
-    for filename in all_files:
-        try:
-            df = pd.read_csv(filename, dtype=str) 
-            df_list.append(df)
-        except Exception as e:
-            print(f"Error reading {filename}: {e}")
-
-    if df_list:
-        combined_df = pd.concat(df_list, ignore_index=True)
-        print(f"Successfully loaded {folder_name}. Shape: {combined_df.shape}")
-        return combined_df
-    return None
-
-def inspect_df(name, df):
-    if df is None:
+from modeling import AadhaarBrain
+
+# The raw shards are queried in place through brain.sql (views raw_enrolment,
+# raw_demographic, raw_biometric: every column as text, exactly as in the CSVs),
+# so nothing is concatenated in pandas first. Set DRISHTI_DATA_DIR to point
+# at the dumps.
+brain = AadhaarBrain()
+
+def inspect_view(name, view):
+    try:
+        columns = brain.sql(f"DESCRIBE {view}")['column_name'].tolist()
+    except Exception as e:
+        print(f"\n--- {name}: no data ({e}) ---")
         return
+    n_rows = brain.sql(f"SELECT count(*) AS n FROM {view}")['n'][0]
     print(f"\n--- Inspecting {name} ---")
-    print(df.info())
+    print(f"Shape: ({n_rows}, {len(columns)})")
     print("\nFirst 5 rows:")
-    print(df.head())
+    print(brain.sql(f"SELECT * FROM {view} LIMIT 5"))
     print("\nMissing Values:")
-    print(df.isnull().sum())
-    print("\ncolumns:", df.columns.tolist())
+    missing = ", ".join(f'count(*) - count("{c}") AS "{c}"' for c in columns)
+    print(brain.sql(f"SELECT {missing} FROM {view}").T[0])
+    print("\ncolumns:", columns)
 
 def main():
     print("Starting Data Inspection...")
     
     # Enrolment
-    enrol_df = load_data("api_data_aadhar_enrolment")
-    inspect_df("Enrolment Data", enrol_df)
+    inspect_view("Enrolment Data", "raw_enrolment")
 
     # Demographic
-    demo_df = load_data("api_data_aadhar_demographic")
-    inspect_df("Demographic Update Data", demo_df)
+    inspect_view("Demographic Update Data", "raw_demographic")
 
     # Biometric
-    bio_df = load_data("api_data_aadhar_biometric")
-    inspect_df("Biometric Update Data", bio_df)
+    inspect_view("Biometric Update Data", "raw_biometric")
 
 if __name__ == "__main__":
     main()
@@ -1,40 +1,28 @@
-from modeling import AadhaarBrain
-from collections import defaultdict
+from audit import audit
 
-brain = AadhaarBrain()
-brain.load_data()
+report = audit()
 
 print("\n=== COMPREHENSIVE DUPLICATE CHECK ===\n")
 
-total_duplicates = 0
+# Duplicate sets: districts of one state that only differ in case/spacing/punctuation
+groups = report['duplicate_groups']
+for state in sorted({g['state'] for g in groups}):
+    print(f"{state}:")
+    for g in groups:
+        if g['state'] == state:
+            print(f"  {[v['district'] for v in g['variants']]}")
+    print()
 
-for state in sorted(brain.demo_df['state'].unique()):
-    districts = list(brain.demo_df[brain.demo_df['state'] == state]['district'].unique())
-    
-    # Find duplicates by normalizing (lowercase, no spaces/hyphens)
-    lower_map = defaultdict(list)
-    for d in districts:
-        normalized = str(d).lower().replace(' ', '').replace('-', '').replace('.', '')
-        lower_map[normalized].append(d)
-    
-    duplicates = {k: v for k, v in lower_map.items() if len(v) > 1}
-    if duplicates:
-        total_duplicates += len(duplicates)
-        print(f"{state}:")
-        for normalized, variants in sorted(duplicates.items()):
-            print(f"  {variants}")
-        print()
-
-if total_duplicates == 0:
+if not groups:
     print("✓ NO DUPLICATES FOUND - All districts are clean!")
 else:
-    print(f"\n⚠️ Found {total_duplicates} duplicate sets")
+    print(f"\n⚠️ Found {len(groups)} duplicate sets")
 
 # Check specific states the user mentioned
 print("\n=== Specific State Checks ===")
 for state in ['Andaman & Nicobar Islands', 'Karnataka', 'Gujarat', 'Andhra Pradesh']:
-    if state in brain.demo_df['state'].unique():
-        districts = sorted(brain.demo_df[brain.demo_df['state'] == state]['district'].unique())
+    if state in report['districts']:
+        districts = report['districts'][state]
         print(f"\n{state}: {len(districts)} districts")
         for d in districts:
             print(f"  - {d}")
@@ -0,0 +1,220 @@
+import pandas as pd
+import numpy as np
+import time
+
+
+# Online surge detection on the daily update load (demographic + biometric) of
+# every district. Each district keeps an EWMA baseline (mean and variance of
+# log1p(load)) and an upper CUSUM of its standardised excess over that baseline;
+# a new day of data is one vectorized step over all districts, O(districts). When
+# a district's CUSUM crosses CUSUM_H it emits an onset event dated to the day the
+# excursion began (the CUSUM change-point estimate), not the day it was noticed.
+# The isolation forests in modeling.py rank districts by lifetime totals; this
+# says when a district started surging.
+
+# Bump when the detector state layout or the statistics change
+SURGE_VERSION = 2
+SURGE_DATASETS = ('demographic', 'biometric')
+
+# Baseline EWMA weight per day (~10 days of memory); the first days of a district
+# use a plain running mean instead
+BASELINE_ALPHA = 0.1
+# CUSUM allowance and decision interval, in baseline standard deviations: excess
+# under K sigma is ignored, a sustained 3-sigma jump alarms on its third day and
+# a 5-sigma one on its second.
+# A larger K also keeps the onset estimate close (noise rarely starts an excursion).
+CUSUM_K = 1.0
+CUSUM_H = 4.0
+# Once warmed up, a day moves the baseline by at most this many standard
+# deviations, so one missing (zero) day or spike doesn't blow up the variance
+BASELINE_CLIP = 3.0
+# Days of activity a district needs before it can alarm
+MIN_DAYS = 14
+# Floor on the baseline standard deviation (log1p units, ~20% of the load), so
+# very steady districts don't alarm on ordinary day-to-day noise. Small districts
+# get the counting-noise floor instead (sd of log1p(Poisson) ~ 1/sqrt(load + 1)).
+MIN_SIGMA = 0.2
+# A day below this load never raises an alarm (a handful of updates in an
+# otherwise idle district is not a surge)
+MIN_LOAD = 20
+
+EVENT_COLUMNS = ['state', 'district', 'onset', 'detected', 'delay_days', 'load', 'baseline', 'ratio', 'z']
+
+
+def _params():
+    return {"alpha": BASELINE_ALPHA, "k": CUSUM_K, "h": CUSUM_H, "min_days": MIN_DAYS, "min_sigma": MIN_SIGMA,
+            "min_load": MIN_LOAD, "clip": BASELINE_CLIP}
+
+
+def _surge_rows(cube_d, datasets=SURGE_DATASETS):
+    return cube_d[cube_d['dataset'].isin(list(datasets)).to_numpy()]
+
+
+def day_digests(rows):
+    # Surge rows of the daily cube -> {day: digest of that day's rows}. A row hash
+    # summed per day doesn't depend on row order, and the whole pass is vectorized,
+    # so checking every processed day costs a hash per cube row, not a rebuild.
+    if rows.empty:
+        return {}
+    day = rows['date'].values.astype('datetime64[D]')
+    days, day_codes = np.unique(day, return_inverse=True)
+    hashes = pd.util.hash_pandas_object(rows[['state', 'district', 'dataset', 'age_bucket', 'total']],
+                                        index=False).to_numpy()
+    sums = np.zeros(len(days), dtype='uint64')
+    np.add.at(sums, day_codes, hashes)
+    return dict(zip(days.tolist(), sums.tolist()))
+
+
+def daily_series(rows):
+    # Surge rows of the daily cube -> (days as datetime64[D], (state, district) keys,
+    # days x districts matrix). Only days present in the data are rows; a district
+    # without rows on such a day counts as zero load that day.
+    if rows.empty:
+        return np.array([], dtype='datetime64[D]'), pd.DataFrame(columns=['state', 'district']), np.zeros((0, 0))
+    totals = rows.groupby(['date', 'state', 'district'], observed=True)['total'].sum().reset_index()
+
+    day = totals['date'].values.astype('datetime64[D]')
+    days, day_codes = np.unique(day, return_inverse=True)
+    keys = totals[['state', 'district']].astype(str)
+    codes, uniques = pd.MultiIndex.from_frame(keys).factorize(sort=True)
+    Y = np.zeros((len(days), len(uniques)))
+    np.add.at(Y, (day_codes, codes), totals['total'].to_numpy(dtype='float64'))
+    return days, pd.DataFrame(list(uniques), columns=['state', 'district']), Y
+
+
+def new_detector():
+    return {
+        "version": SURGE_VERSION,
+        "params": _params(),
+        "keys": [],               # (state, district) per column
+        "index": {},              # (state, district) -> column
+        "mean": np.zeros(0),      # EWMA of log1p(load)
+        "var": np.zeros(0),       # EWMA variance of log1p(load)
+        "cusum": np.zeros(0),
+        "days_seen": np.zeros(0, dtype='int64'),
+        "run_start": np.zeros(0, dtype='datetime64[D]'),   # first day of the current CUSUM excursion
+        "in_surge": np.zeros(0, dtype=bool),
+        "surge_onset": np.zeros(0, dtype='datetime64[D]'),
+        "last_day": None,
+        "digests": {},            # processed day -> day_digests() entry
+        "events": [],
+    }
+
+
+def _grow(det, keys):
+    # Columns for districts seen for the first time
+    new = [k for k in keys if k not in det["index"]]
+    if not new:
+        return
+    for k in new:
+        det["index"][k] = len(det["keys"])
+        det["keys"].append(k)
+    n = len(new)
+    nat = np.full(n, np.datetime64('NaT'), dtype='datetime64[D]')
+    for name, fill in [("mean", np.zeros(n)), ("var", np.zeros(n)), ("cusum", np.zeros(n)),
+                       ("days_seen", np.zeros(n, dtype='int64')), ("run_start", nat),
+                       ("in_surge", np.zeros(n, dtype=bool)), ("surge_onset", nat)]:
+        det[name] = np.concatenate([det[name], fill])
+
+
+def step(det, day, x):
+    # Fold one day of load (x aligned with det["keys"]) into every district at once.
+    # Returns the onset events it raised.
+    y = np.log1p(x)
+    mean, var = det["mean"], det["var"]
+    # A district starts with its first day of activity, so one that appears late
+    # isn't judged against the zeros before it existed
+    active = (det["days_seen"] > 0) | (x > 0)
+    floor = np.maximum(MIN_SIGMA, 1.0 / np.sqrt(np.expm1(mean) + 1.0))
+    sigma = np.maximum(np.sqrt(var), floor)
+    z = np.where(active, (y - mean) / sigma, 0.0)
+
+    ready = active & (det["days_seen"] >= MIN_DAYS)
+    was_surging = det["in_surge"]
+    cusum = np.where(ready & ~was_surging, np.maximum(0.0, det["cusum"] + z - CUSUM_K), 0.0)
+    starting = (det["cusum"] == 0) & (cusum > 0)
+    det["run_start"][starting] = day
+    alarm = (cusum > CUSUM_H) & (x >= MIN_LOAD)
+
+    events = []
+    for i in np.flatnonzero(alarm):
+        baseline = float(np.expm1(mean[i]))
+        onset = det["run_start"][i]
+        state, district = det["keys"][i]
+        events.append({"state": state, "district": district,
+                       "onset": pd.Timestamp(onset), "detected": pd.Timestamp(day),
+                       "delay_days": int((day - onset).astype('int64')),
+                       "load": float(x[i]), "baseline": round(baseline, 2),
+                       "ratio": round(float(x[i]) / max(baseline, 1.0), 3), "z": round(float(z[i]), 3)})
+    det["surge_onset"][alarm] = det["run_start"][alarm]
+    # A surge lasts until the load is back at or below its baseline; meanwhile the
+    # district can't alarm again and its CUSUM restarts from zero afterwards
+    det["in_surge"] = (was_surging & (z > 0)) | alarm
+    cusum[alarm] = 0.0
+    det["cusum"] = cusum
+
+    # Baseline update: running mean/variance over the first days, then a clipped EWMA
+    alpha = np.maximum(BASELINE_ALPHA, 1.0 / (det["days_seen"] + 1))
+    diff = y - mean
+    limit = np.where(det["days_seen"] >= MIN_DAYS, BASELINE_CLIP * sigma, np.inf)
+    diff = np.clip(diff, -limit, limit)
+    det["mean"] = np.where(active, mean + alpha * diff, mean)
+    det["var"] = np.where(active, (1 - alpha) * (var + alpha * diff ** 2), var)
+    det["days_seen"] = det["days_seen"] + active
+    det["last_day"] = day
+    det["events"].extend(events)
+    return events
+
+
+def update(det, cube_d):
+    # Bring a detector up to date with the daily cube and return (detector, events
+    # raised by days it hadn't seen). Every processed day is checked against its
+    # digest; if none changed, only the rows of days after the last processed one are
+    # built into a matrix and stepped. If one did (late rows for an old day, a shard
+    # edited or removed), the history is replayed from scratch, which is still one
+    # vectorized step per day.
+    t0 = time.perf_counter()
+    if det is None or det.get("version") != SURGE_VERSION or det["params"] != _params():
+        det = new_detector()
+    rows = _surge_rows(cube_d)
+    digests = day_digests(rows)
+    last = det["last_day"]
+    if last is not None:
+        last = np.datetime64(last, 'D').item()
+        old = {day: digest for day, digest in digests.items() if day <= last}
+        if old != det["digests"]:
+            print("Surge detector: processed days changed, replaying the history.")
+            replayed, _ = update(None, cube_d)
+            return replayed, [e for e in replayed["events"] if e["detected"] > pd.Timestamp(last)]
+        rows = rows[rows['date'].values.astype('datetime64[D]') > np.datetime64(last, 'D')]
+
+    days, keys, Y = daily_series(rows)
+    key_list = list(keys.itertuples(index=False, name=None))
+    _grow(det, key_list)
+    columns = [det["index"][k] for k in key_list]
+    events = []
+    for i, day in enumerate(days):
+        x = np.zeros(len(det["keys"]))
+        x[columns] = Y[i]
+        events.extend(step(det, day, x))
+        det["digests"][day.item()] = digests[day.item()]
+    det["update_days"] = len(days)
+    det["update_seconds"] = round(time.perf_counter() - t0, 4)
+    return det, events
+
+
+def events_frame(det):
+    # Every onset event raised so far, newest first
+    events = pd.DataFrame(det["events"] if det else [], columns=EVENT_COLUMNS)
+    return events.sort_values(['detected', 'ratio'], ascending=[False, False]).reset_index(drop=True)
+
+
+def active_frame(det):
+    # Districts currently in a surge: state, district, onset and their current baseline load
+    if not det or not det["in_surge"].any():
+        return pd.DataFrame(columns=['state', 'district', 'onset', 'baseline'])
+    idx = np.flatnonzero(det["in_surge"])
+    frame = pd.DataFrame([det["keys"][i] for i in idx], columns=['state', 'district'])
+    frame['onset'] = det["surge_onset"][idx].astype('datetime64[s]')
+    frame['baseline'] = np.expm1(det["mean"][idx]).round(2)
+    return frame.sort_values('onset', ascending=False).reset_index(drop=True)